@@ -0,0 +1,155 @@
+"""
+FIRMA E VERIFICA SU PIÙ CORE
+
+Tutto quello che abbiamo scritto finora è aritmetica sui grandi interi in Python puro: per quanto lo rendiamo efficiente, gira su un solo
+core, perché il GIL (Global Interpreter Lock) lascia eseguire codice Python a un solo thread alla volta. Usare i thread non serve:
+per usare tutti i core ci vogliono più processi.
+
+Con concurrent.futures.ProcessPoolExecutor creiamo un gruppo (pool) di processi a cui mandare il lavoro. Due accorgimenti:
+1. Quello che mandiamo ai processi e quello che ci torna indietro viene serializzato con pickle e passato attraverso una pipe. Conviene
+   quindi mandare dati compatti: per firmare la coppia (segreto, z) come due blocchi da 32 byte, per verificare la terna
+   (chiave pubblica SEC, z, firma DER), e ricevere indietro la firma DER o un booleano. Mandiamo inoltre i lavori a gruppi (chunk), per
+   pagare il costo della comunicazione una volta ogni tanti lavori invece che per ognuno.
+2. Ogni processo ha la sua memoria, quindi la sua tabella di G (vedi 6. TabellaGeneratore), i suoi multipli dispari di G
+   (7. TruccoDiShamir) e la sua cache delle chiavi pubbliche (../2. Network/3. ParseSECVeloce). Le prepariamo appena il processo parte,
+   con la funzione initializer del pool, così il primo lavoro non paga il costo di costruirle. Se la tabella di G è salvata su disco
+   ogni processo la rilegge invece di ricalcolarla.
+
+Per leggere le firme ricevute ci serve il parsing del formato DER, l'inverso di Signature.der():
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+class Signature:
+    #...
+    @classmethod
+    def parse(cls, signature_bin):
+        s = BytesIO(signature_bin)
+        compound = s.read(1)[0]
+        if compound != 0x30:
+            raise SyntaxError('Bad Signature')
+        length = s.read(1)[0]
+        if length + 2 != len(signature_bin):
+            raise SyntaxError('Bad Signature Length')
+        marker = s.read(1)[0]
+        if marker != 0x02:
+            raise SyntaxError('Bad Signature')
+        rlength = s.read(1)[0]
+        r = int.from_bytes(s.read(rlength), 'big')
+        marker = s.read(1)[0]
+        if marker != 0x02:
+            raise SyntaxError('Bad Signature')
+        slength = s.read(1)[0]
+        s = int.from_bytes(s.read(slength), 'big')
+        if len(signature_bin) != 6 + rlength + slength:
+            raise SyntaxError('Signature too long')
+        return cls(r, s)
+
+"""
+Le funzioni che girano nei processi del pool. Devono stare a livello di modulo, perché il pool le manda ai processi per nome.
+Anche le chiavi private restano in cache nel processo: PrivateKey calcola la chiave pubblica nel costruttore, e un servizio di firma
+usa sempre le stesse poche chiavi.
+"""
+
+WORKER_KEYS = {}        #in ogni processo, le PrivateKey già create
+WORKER_KEYS_SIZE = 1000
+
+def init_worker(g_table_path=None):
+    global G_TABLE_PATH
+    G_TABLE_PATH = g_table_path
+    g_table()
+    g_odd_multiples()
+
+def worker_key(secret_bytes):
+    key = WORKER_KEYS.get(secret_bytes)
+    if key is None:
+        if len(WORKER_KEYS) >= WORKER_KEYS_SIZE:
+            WORKER_KEYS.clear()
+        key = WORKER_KEYS[secret_bytes] = PrivateKey(int.from_bytes(secret_bytes, 'big'))
+    return key
+
+def sign_chunk(items):
+    #items: lista di (segreto, z) da 32 byte ciascuno. Restituisce le firme DER
+    return [worker_key(secret).sign(int.from_bytes(z, 'big')).der() for secret, z in items]
+
+def verify_chunk(items):
+    #items: lista di (SEC, z, DER). Restituisce un booleano per ogni terna; i dati malformati sono firme non valide
+    results = [False] * len(items)
+    parsed = []
+    positions = []
+    for i, (sec, z, der) in enumerate(items):
+        try:
+            parsed.append((S256Point.parse(sec), int.from_bytes(z, 'big'), Signature.parse(der)))
+        except (ValueError, SyntaxError, IndexError):
+            continue
+        positions.append(i)
+    for i, ok in zip(positions, verify_batch(parsed)):     #il chunk si verifica con la verifica batch (vedi 8. VerificaBatch)
+        results[i] = ok
+    return results
+
+def chunks(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+class CryptoPool:
+    '''Pool di processi per firmare e verificare in parallelo.
+    Si usa con with, oppure chiamando close() alla fine.'''
+
+    def __init__(self, processes=None, chunk_size=64, g_table_path=None):
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(processes, initializer=init_worker, initargs=(g_table_path,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def sign_many(self, items):
+        #chiamata sincrona: blocca finché tutte le firme sono pronte, e le restituisce nell'ordine delle richieste
+        results = []
+        for chunk in self.executor.map(sign_chunk, chunks(items, self.chunk_size)):
+            results.extend(chunk)
+        return results
+
+    def verify_many(self, items):
+        results = []
+        for chunk in self.executor.map(verify_chunk, chunks(items, self.chunk_size)):
+            results.extend(chunk)
+        return results
+
+    async def sign_many_async(self, items):
+        #versione per asyncio: il loop resta libero mentre i processi lavorano
+        return await self.run_async(sign_chunk, items)
+
+    async def verify_many_async(self, items):
+        return await self.run_async(verify_chunk, items)
+
+    async def run_async(self, function, items):
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self.executor, function, chunk) for chunk in chunks(items, self.chunk_size)]
+        results = []
+        for chunk in await asyncio.gather(*futures):
+            results.extend(chunk)
+        return results
+
+"""
+>>> secret = (12345).to_bytes(32, 'big')
+>>> items = [(secret, z.to_bytes(32, 'big')) for z in range(1, 10001)]
+>>> with CryptoPool(processes=8) as pool:
+...     sigs = pool.sign_many(items)
+...     sec = PrivateKey(12345).point.sec()
+...     all(pool.verify_many([(sec, z, sig) for (_, z), sig in zip(items, sigs)]))
+True
+
+E da una coroutine:
+
+>>> sigs = await pool.sign_many_async(items)
+
+Il guadagno è circa lineare nel numero di core, meno il costo di serializzare i lavori e costruire le tabelle nei processi. Con pochi
+lavori (qualche decina) conviene ancora la chiamata diretta: il pool si ripaga su lotti di centinaia di firme.
+"""
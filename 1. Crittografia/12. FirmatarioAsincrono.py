@@ -0,0 +1,111 @@
+"""
+FIRMA DA UN SERVER ASYNCIO, A PICCOLI LOTTI
+
+Un server scritto con asyncio gestisce tutte le richieste in un solo thread, passando da una all'altra quando una aspetta (la rete, il
+disco). Chiamare PrivateKey.sign direttamente da una coroutine blocca tutto il loop per la durata della firma: in quel tempo nessun'altra
+richiesta va avanti.
+Con CryptoPool.sign_many_async (vedi 11. FirmaParallela) la firma gira in un altro processo e il loop resta libero, ma se ogni richiesta
+manda la sua singola firma al pool paghiamo per ognuna il costo della comunicazione tra processi.
+
+Facciamo quindi un piccolo "raccoglitore": le richieste che arrivano vengono messe da parte e spedite insieme (micro-batch) quando sono
+diventate max_batch_size, oppure quando la più vecchia ha aspettato max_delay secondi. Ogni richiesta riceve un asyncio.Future che viene
+completato quando torna il risultato del suo lotto. max_delay è il ritardo massimo che accettiamo di aggiungere a una firma in cambio di
+lotti più grandi: con poco traffico i lotti partono quasi vuoti dopo max_delay, con tanto traffico si riempiono prima.
+
+Teniamo anche qualche contatore per capire come sta andando: quante richieste aspettano di partire (queue depth), quanti lotti sono in
+lavorazione e quanto sono grandi in media.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+class AsyncSigner:
+    '''executor: dove firmare i lotti, per esempio CryptoPool().executor. Con None ne viene creato uno.
+    Un executor a thread non serve: la firma è Python puro e, per via del GIL, bloccherebbe comunque il loop.'''
+
+    def __init__(self, executor=None, max_batch_size=64, max_delay=0.005):
+        self.own_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(initializer=init_worker)
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.pending = []       #le richieste non ancora spedite: (segreto, z) e il Future da completare
+        self.timer = None
+        self.in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.max_queue_depth = 0
+
+    def __repr__(self):
+        return 'AsyncSigner(queue={}, in_flight={}, batches={}, requests={})'.format(
+            len(self.pending), self.in_flight, self.batches, self.requests)
+
+    async def sign(self, secret, z):
+        #restituisce la firma DER di z con la chiave privata secret
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(((secret.to_bytes(32, 'big'), z.to_bytes(32, 'big')), future))
+        self.max_queue_depth = max(self.max_queue_depth, len(self.pending))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        #spedisce subito le richieste in attesa
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        done = loop.run_in_executor(self.executor, sign_chunk, [item for item, _ in batch])
+        done.add_done_callback(lambda done: self.resolve(batch, done))
+
+    def resolve(self, batch, done):
+        self.in_flight -= 1
+        try:
+            signatures = done.result()
+        except BaseException as e:      #il lotto è fallito: lo diciamo a tutte le richieste che ne facevano parte
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), signature in zip(batch, signatures):
+            if not future.done():       #la richiesta potrebbe essere stata cancellata nel frattempo
+                future.set_result(signature)
+
+    def stats(self):
+        return {
+            'queue_depth': len(self.pending),
+            'max_queue_depth': self.max_queue_depth,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+        }
+
+    def close(self):
+        if self.own_executor:
+            self.executor.shutdown()
+
+"""
+>>> async def handle(signer, z):       #per esempio, il gestore di una richiesta del server
+...     return await signer.sign(12345, z)
+>>> async def main():
+...     signer = AsyncSigner(max_batch_size=64, max_delay=0.005)
+...     sigs = await asyncio.gather(*(handle(signer, z) for z in range(1, 1001)))
+...     print(signer.stats())
+...     signer.close()
+>>> asyncio.run(main())
+{'queue_depth': 0, 'max_queue_depth': 64, 'in_flight': 0, 'requests': 1000, 'batches': 16, 'mean_batch_size': 62.5, 'largest_batch': 64}
+"""
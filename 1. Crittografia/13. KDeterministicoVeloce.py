@@ -0,0 +1,125 @@
+"""
+UN k DETERMINISTICO PIÙ VELOCE
+
+Il deterministic_k di 4. CorollarioK calcola almeno sei HMAC per ogni firma, e per ognuna hmac.new crea un nuovo oggetto, prepara la
+chiave e concatena qualche stringa di byte. Quando firmiamo tante volte con la stessa chiave, buona parte di questo lavoro è sempre uguale.
+
+Ricordiamo come funziona HMAC con sha256 (il blocco di sha256 è di 64 byte, le nostre chiavi sono tutte di 32 byte):
+HMAC(key, msg) = sha256((key ^ opad) + sha256((key ^ ipad) + msg))
+dove la chiave viene allungata a 64 byte con degli zeri, ipad è il byte 0x36 ripetuto e opad il byte 0x5c ripetuto.
+Un oggetto hashlib.sha256 a cui abbiamo già passato (key ^ ipad) è uno "stato interno" pronto: con copy() ne facciamo una copia da
+continuare con msg, senza ripartire da capo. Lo stesso vale per lo stato esterno con (key ^ opad).
+
+Quindi:
+1. la prima HMAC usa sempre la chiave 00...00 e il messaggio v + 00 + secret_bytes + z_bytes, dove v = 01...01 è fisso: per una data
+   chiave privata possiamo preparare una volta sola gli stati già avanzati fino a secret_bytes, e per ogni firma aggiungere solo z_bytes;
+2. secret_bytes lo codifichiamo una volta sola;
+3. ogni chiave k intermedia viene usata per due HMAC di fila: prepariamo i suoi stati una volta e li copiamo.
+I k prodotti sono identici bit per bit a quelli di 4. CorollarioK.
+"""
+
+import hashlib
+import hmac
+from timeit import timeit
+
+IPAD = bytes(x ^ 0x36 for x in range(256))      #tabelle per fare lo xor di tutti i byte con bytes.translate
+OPAD = bytes(x ^ 0x5c for x in range(256))
+
+def hmac_states(key):
+    #stato interno e stato esterno di HMAC-sha256 per una chiave di 32 byte
+    block = key + b'\x00' * 32
+    return hashlib.sha256(block.translate(IPAD)), hashlib.sha256(block.translate(OPAD))
+
+def hmac_digest(inner, outer, msg):
+    #HMAC di msg a partire dagli stati preparati, che restano intatti
+    inner = inner.copy()
+    inner.update(msg)
+    outer = outer.copy()
+    outer.update(inner.digest())
+    return outer.digest()
+
+class DeterministicK:
+    #i k di RFC6979 per una chiave privata
+
+    def __init__(self, secret):
+        self.secret = secret
+        self.secret_bytes = secret.to_bytes(32, 'big')
+        inner, outer = hmac_states(b'\x00' * 32)
+        inner.update(b'\x01' * 32 + b'\x00' + self.secret_bytes)
+        self.first_inner = inner
+        self.first_outer = outer
+
+    def k(self, z):
+        if z > N:
+            z -= N
+        z_bytes = z.to_bytes(32, 'big')
+        k = hmac_digest(self.first_inner, self.first_outer, z_bytes)
+        inner, outer = hmac_states(k)
+        v = hmac_digest(inner, outer, b'\x01' * 32)
+        k = hmac_digest(inner, outer, v + b'\x01' + self.secret_bytes + z_bytes)
+        inner, outer = hmac_states(k)
+        v = hmac_digest(inner, outer, v)
+        while True:
+            v = hmac_digest(inner, outer, v)
+            candidate = int.from_bytes(v, 'big')
+            if candidate >= 1 and candidate < N:
+                return candidate
+            k = hmac_digest(inner, outer, v + b'\x00')
+            inner, outer = hmac_states(k)
+            v = hmac_digest(inner, outer, v)
+
+"""
+PrivateKey si tiene il suo DeterministicK e lo crea alla prima firma:
+"""
+
+class PrivateKey:
+    #...
+    def deterministic_k(self, z):
+        generator = self.__dict__.get('k_generator')
+        if generator is None or generator.secret != self.secret:
+            generator = self.k_generator = DeterministicK(self.secret)
+        return generator.k(z)
+
+"""
+Per il confronto teniamo la versione di 4. CorollarioK come funzione:
+"""
+
+def hmac_deterministic_k(secret, z):
+    k = b'\x00' * 32
+    v = b'\x01' * 32
+    if z > N:
+        z -= N
+    z_bytes = z.to_bytes(32, 'big')
+    secret_bytes = secret.to_bytes(32, 'big')
+    s256 = hashlib.sha256
+    k = hmac.new(k, v + b'\x00' + secret_bytes + z_bytes, s256).digest()
+    v = hmac.new(k, v, s256).digest()
+    k = hmac.new(k, v + b'\x01' + secret_bytes + z_bytes, s256).digest()
+    v = hmac.new(k, v, s256).digest()
+    while True:
+        v = hmac.new(k, v, s256).digest()
+        candidate = int.from_bytes(v, 'big')
+        if candidate >= 1 and candidate < N:
+            return candidate
+        k = hmac.new(k, v + b'\x00', s256).digest()
+        v = hmac.new(k, v, s256).digest()
+
+def benchmark_deterministic_k(secret=12345, count=10000):
+    #microsecondi per k con le due versioni, dopo aver controllato che diano gli stessi k
+    generator = DeterministicK(secret)
+    zs = [int.from_bytes(hash256(i.to_bytes(4, 'big')), 'big') for i in range(count)]
+    for z in zs[:100]:
+        assert generator.k(z) == hmac_deterministic_k(secret, z)
+    old = timeit(lambda: [hmac_deterministic_k(secret, z) for z in zs], number=1)
+    new = timeit(lambda: [generator.k(z) for z in zs], number=1)
+    return {'hmac': old / count * 1e6, 'states': new / count * 1e6}
+
+"""
+>>> PrivateKey(12345).deterministic_k(1000) == hmac_deterministic_k(12345, 1000)
+True
+>>> benchmark_deterministic_k()
+{'hmac': 10.4, 'states': 6.4}
+
+(valori arrotondati, CPython 3.11). Circa 1.6 volte più veloce; su una firma completa, dominata dalla moltiplicazione k*G, il guadagno
+è di qualche microsecondo.
+"""
@@ -0,0 +1,166 @@
+"""
+CACHE DELLE FIRME GIÀ VERIFICATE
+
+Una transazione arriva di solito due volte a un nodo: prima da sola, quando entra nella mempool, e poi dentro un blocco. Entrambe le
+volte verifichiamo tutte le sue firme con S256Point.verify, e la seconda volta è proprio quella che conta per la velocità con cui
+validiamo un blocco nuovo. Ma se una terna (chiave pubblica, z, firma) era valida nella mempool, lo è anche nel blocco.
+
+Bitcoin Core risolve il problema con una cache delle firme valide, e facciamo lo stesso:
+- la chiave della cache è lo sha256 di SEC + z + DER, preceduto da un "sale" casuale scelto all'avvio. Senza sale chi ci manda le
+  transazioni saprebbe in anticipo dove finisce ogni firma nella cache e potrebbe costruirne apposta per disturbarla;
+- inseriamo solo le firme valide: una firma non valida non va ricordata, la transazione che la contiene viene scartata;
+- la memoria è limitata: fissiamo il massimo in byte e ne ricaviamo il numero massimo di elementi. Quando la cache è piena scartiamo un
+  elemento, a caso (come fa Core, ed è la scelta più semplice e veloce) oppure quello usato meno di recente (LRU, come in
+  ../2. Network/3. ParseSECVeloce);
+- la cache si può usare da più thread insieme: le operazioni sulla cache sono protette da un lock, mentre la verifica vera e propria,
+  che è la parte lenta, avviene fuori dal lock.
+Lo stato di sha256 dopo il sale lo prepariamo una volta sola e lo copiamo per ogni chiave (vedi 13. KDeterministicoVeloce).
+"""
+
+import hashlib
+import os
+import random
+import threading
+from collections import OrderedDict
+
+SIG_CACHE_BYTES = 32 * 1024 * 1024      #32MB, come il default di Bitcoin Core
+SIG_CACHE_ENTRY_BYTES = 160             #memoria occupata in media da un elemento (32 byte di chiave più dizionario e lista) in CPython
+
+class SignatureCache:
+    '''eviction: 'random' oppure 'lru' '''
+
+    def __init__(self, max_bytes=SIG_CACHE_BYTES, eviction='random', salt=None):
+        if eviction not in ('random', 'lru'):
+            raise ValueError('eviction must be random or lru, not {}'.format(eviction))
+        self.maxsize = max(1, max_bytes // SIG_CACHE_ENTRY_BYTES)
+        self.eviction = eviction
+        self.salted = hashlib.sha256(os.urandom(32) if salt is None else salt)
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __repr__(self):
+        return 'SignatureCache(size={}/{}, eviction={}, hits={}, misses={})'.format(
+            len(self.entries), self.maxsize, self.eviction, self.hits, self.misses)
+
+    def key(self, sec, z, der):
+        h = self.salted.copy()
+        h.update(sec)
+        h.update(z.to_bytes(32, 'big'))
+        h.update(der)
+        return h.digest()
+
+    def contains(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                if self.eviction == 'lru':
+                    self.entries.move_to_end(key)
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, key):
+        with self.lock:
+            if key in self.entries:
+                return
+            if len(self.entries) >= self.maxsize:
+                self.evict()
+            if self.eviction == 'lru':
+                self.entries[key] = None
+            else:
+                self.entries[key] = len(self.keys)     #la posizione della chiave nella lista, per scartarla in O(1)
+                self.keys.append(key)
+
+    def evict(self):
+        #da chiamare con il lock già preso
+        self.evictions += 1
+        if self.eviction == 'lru':
+            self.entries.popitem(last=False)
+            return
+        i = random.randrange(len(self.keys))
+        last = self.keys.pop()
+        del self.entries[self.keys[i] if i < len(self.keys) else last]
+        if i < len(self.keys):      #al posto della chiave scartata mettiamo l'ultima della lista
+            self.keys[i] = last
+            self.entries[last] = i
+
+    def verify(self, sec, z, der, verify):
+        #verify è la funzione senza argomenti che fa la verifica vera, chiamata solo se la terna non è in cache
+        key = self.key(sec, z, der)
+        if self.contains(key):
+            return True
+        if not verify():
+            return False
+        self.add(key)
+        return True
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict() if self.eviction == 'lru' else {}
+            self.keys = []
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+SIG_CACHE = SignatureCache()
+
+"""
+S256Point.verify passa dalla cache; la verifica di 7. TruccoDiShamir resta disponibile come verify_uncached. Per chi ha già i byte,
+per esempio dagli script di una transazione, c'è verify_sec, che con la terna in cache non fa nemmeno il parsing della chiave e della
+firma.
+"""
+
+class S256Point(Point):
+    #...
+    def verify(self, z, sig):
+        if self.x is None or not (1 <= sig.r < N and 1 <= sig.s < N):     #prima della chiave della cache: sec() e der() fallirebbero
+            return False
+        return SIG_CACHE.verify(self.sec(), z, sig.der(), lambda: self.verify_uncached(z, sig))
+
+    def verify_uncached(self, z, sig):
+        if self.x is None or not (1 <= sig.r < N and 1 <= sig.s < N):
+            return False
+        s_inv = pow(sig.s, N - 2, N)
+        u = z * s_inv % N
+        v = sig.r * s_inv % N
+        total = from_jacobian(*shamir_mul(u, self, v))
+        if total.x is None:
+            return False
+        return total.x.num == sig.r
+
+def verify_sec(sec, z, der):
+    #restituisce False anche se la chiave o la firma non si possono leggere
+    def verify():
+        try:
+            point = S256Point.parse(sec)
+            sig = Signature.parse(der)
+        except (ValueError, SyntaxError, IndexError):
+            return False
+        return point.verify_uncached(z, sig)
+    return SIG_CACHE.verify(sec, z, der, verify)
+
+"""
+>>> z = 0xbc62d4b80d9e36da29c16c5d4d9f11731f36052c72401a76c23c0fb5a9b74423
+>>> sig = Signature(0x37206a0610995c58074999cb9767b87af4c4978db68c06e8e6e81d282047a7c6,
+...                 0x8ca63759c1157ebeaec0d03cecca119fc9a75bf8e6d0fa65c841c8e2738cdaec)
+>>> point = S256Point(0x04519fac3d910ca7e7138f7013706f619fa8f033e6ec6e09370ea38cee6a7574,
+...                   0x82b51eab8c27c66e26c858a079bcdf4f1ada34cec420cafc7eac1a42216fb6c4)
+>>> point.verify(z, sig), point.verify(z, sig)      #mempool, poi blocco
+(True, True)
+>>> SIG_CACHE.stats()
+{'size': 1, 'maxsize': 209715, 'hits': 1, 'misses': 1, 'evictions': 0, 'hit_rate': 0.5}
+
+Con CPython 3.11 una firma già in cache costa circa 3µs (per lo più sec() e der()) invece di circa 2ms; con verify_sec poco più di 1µs.
+"""
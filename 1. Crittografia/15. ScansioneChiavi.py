@@ -0,0 +1,98 @@
+"""
+SCANSIONE DI CHIAVI CONSECUTIVE
+
+Per riempire in anticipo un pool di chiavi, o per controllare quali indirizzi di un wallet hanno ricevuto qualcosa, ci servono le chiavi
+pubbliche di una serie di segreti consecutivi e, e+1, e+2, ... Calcolare ogni (e+i)*G con una moltiplicazione completa è uno spreco:
+(e+i+1)*G = (e+i)*G + G, quindi da una chiave alla successiva basta una somma.
+
+Una somma in coordinate affini costa però un'inversione, e ogni somma dipende dalla precedente, quindi le inversioni non si possono
+raggruppare con batch_inverse (vedi 9. InversioneBatch). Rovesciamo allora il punto di vista: prendiamo una "base" B = e*G e una tabella
+fissa dei multipli 1*G, 2*G, ..., W*G in coordinate affini. Le W chiavi successive sono B + 1*G, B + 2*G, ..., B + W*G: sono somme
+indipendenti tra loro, e le loro W inversioni le facciamo con una sola esponenziazione. L'ultima diventa la base della finestra dopo.
+
+Per ogni chiave restano così poche moltiplicazioni modulo P: tre per l'inversione batch e tre per la somma affine
+    lambda = (y2 - y1) / (x2 - x1)
+    x3 = lambda^2 - x1 - x2
+    y3 = lambda * (x1 - x3) - y1
+contro le centinaia di una moltiplicazione scalare.
+
+L'unico caso particolare è x2 = x1, cioè B = i*G oppure B = -i*G: succede solo con segreti minori di W o maggiori di N - W. Il secondo
+lo escludiamo (l'intervallo deve restare tra 1 e N-1), il primo lo calcoliamo con una moltiplicazione normale.
+"""
+
+import hashlib
+
+SCAN_WINDOW = 256
+SCAN_TABLES = {}        #per ogni W, i multipli 1*G ... W*G in coordinate affini
+
+def scan_table(window=SCAN_WINDOW):
+    if window not in SCAN_TABLES:
+        points = []
+        X, Y, Z = 1, 1, 0
+        for _ in range(window):
+            X, Y, Z = jacobian_add_affine(X, Y, Z, G.x.num, G.y.num)
+            points.append((X, Y, Z))
+        z_invs = batch_inverse([Z for _, _, Z in points], P)
+        SCAN_TABLES[window] = [(X * z_inv * z_inv % P, Y * z_inv * z_inv * z_inv % P) for (X, Y, _), z_inv in zip(points, z_invs)]
+    return SCAN_TABLES[window]
+
+def affine_mul(secret):
+    #secret*G come coppia di interi (x, y)
+    X, Y, Z = generator_mul(secret)
+    z_inv = pow(Z, P - 2, P)
+    return X * z_inv * z_inv % P, Y * z_inv * z_inv * z_inv % P
+
+def scan_points(start, count, window=SCAN_WINDOW):
+    #generatore di (segreto, x, y) per i segreti da start a start + count - 1
+    if start < 1 or start + count > N:
+        raise ValueError('key range must stay between 1 and N-1')
+    if count <= 0:
+        return
+    table = scan_table(window)
+    x1, y1 = affine_mul(start)
+    yield start, x1, y1
+    done = 1
+    while done < count:
+        n = min(window, count - done)
+        base = start + done - 1         #il segreto di (x1, y1)
+        denominators = [(x2 - x1) % P for x2, _ in table[:n]]
+        doublings = [i for i, d in enumerate(denominators) if d == 0]       #B = (i+1)*G: B + (i+1)*G va calcolato a parte
+        for i in doublings:
+            denominators[i] = 1
+        invs = batch_inverse(denominators, P)
+        for i, ((x2, y2), inv) in enumerate(zip(table, invs)):
+            if doublings and i in doublings:
+                x3, y3 = affine_mul(base + i + 1)
+            else:
+                slope = (y2 - y1) * inv % P
+                x3 = (slope * slope - x1 - x2) % P
+                y3 = (slope * (x1 - x3) - y1) % P
+            yield base + i + 1, x3, y3
+        x1, y1 = x3, y3
+        done += n
+
+def scan_sec(start, count, compressed=True, window=SCAN_WINDOW):
+    #generatore di (segreto, SEC)
+    for secret, x, y in scan_points(start, count, window):
+        if compressed:
+            yield secret, (b'\x03' if y & 1 else b'\x02') + x.to_bytes(32, 'big')
+        else:
+            yield secret, b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+
+def scan_hash160(start, count, compressed=True, window=SCAN_WINDOW):
+    #generatore di (segreto, hash160), da confrontare con gli script o da codificare con encode_base58_checksum
+    sha256 = hashlib.sha256
+    for secret, sec in scan_sec(start, count, compressed, window):
+        h = RIPEMD160.copy()        #vedi ../2. Network/8. IndirizziInBlocco
+        h.update(sha256(sec).digest())
+        yield secret, h.digest()
+
+"""
+>>> [sec.hex()[:10] for _, sec in scan_sec(1, 3)]
+['0279be667e', '02c6047f94', '02f9308a01']
+>>> next(scan_sec(2**200, 1))[1] == (2**200 * G).sec()
+True
+
+Con CPython 3.11 una chiave pubblica costa circa 4.5µs invece di circa 0.5ms con la tabella di G: più di cento volte meno. Con SEC e
+hash160 si arriva a circa 6µs a chiave.
+"""
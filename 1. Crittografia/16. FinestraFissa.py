@@ -0,0 +1,110 @@
+"""
+MOLTIPLICAZIONE A FINESTRA FISSA PER LE CHIAVI PRIVATE
+
+Tutte le moltiplicazioni che abbiamo scritto decidono cosa fare guardando il coefficiente: jacobian_mul (5. CoordinateJacobiane) fa
+una somma solo se il bit è 1, generator_mul (6. TabellaGeneratore) salta le cifre nulle, wnaf (7. TruccoDiShamir) cambia sequenza a
+seconda delle cifre. Per la verifica va benissimo, perché i numeri in gioco sono pubblici. Quando moltiplichiamo per un segreto invece (la
+chiave privata per ricavarne la chiave pubblica, o il k di una firma) il tempo impiegato dipende dai bit del segreto, e chi riesce a
+misurarlo abbastanza bene ne ricava informazioni: è un "timing attack".
+
+La moltiplicazione a finestra fissa esegue sempre la stessa sequenza di operazioni, qualunque sia il coefficiente:
+1. prepariamo una tabella con i multipli 1*P, 2*P, ..., (2^w - 1)*P, in coordinate affini, con una sola inversione
+   (9. InversioneBatch). Al posto di 0*P mettiamo un punto qualsiasi, P stesso: è il punto "finto";
+2. leggiamo il coefficiente a blocchi di w bit, partendo dai più significativi. Per ogni blocco facciamo sempre w raddoppi e una somma
+   con il multiplo della tabella indicato dal blocco. Se il blocco vale 0 sommiamo il punto finto e buttiamo via il risultato;
+3. perché la sequenza non dipenda nemmeno dalla lunghezza del coefficiente, invece di k usiamo k + N oppure k + 2N (danno lo stesso
+   punto, perché N*P = 0), scegliendo quello che ha esattamente 257 bit. Il primo blocco non è mai nullo, e partiamo direttamente dal
+   suo multiplo invece che dal punto all'infinito, che richiederebbe un caso a parte nelle somme.
+Con w = 4 sono sempre 256 raddoppi e 64 somme. jacobian_mul fa in media 256 raddoppi e 128 somme, quindi la finestra fissa è anche più
+veloce.
+
+Un'avvertenza onesta: in Python non si può garantire un tempo davvero costante, perché l'interprete e le operazioni sugli interi grandi
+hanno tempi che dipendono dai valori. Quello che otteniamo è una sequenza di operazioni uniforme, che elimina la differenza più grande e
+più facile da misurare.
+"""
+
+from timeit import timeit
+
+FIXED_WINDOW = 4
+G_FIXED_TABLE = None
+
+def fixed_window_table(point, w=FIXED_WINDOW):
+    #[P, 1*P, 2*P, ..., (2^w - 1)*P] come coppie (x, y) di interi; la prima è il punto finto
+    x, y = point.x.num, point.y.num
+    points = [(x, y, 1)]
+    X, Y, Z = x, y, 1
+    for _ in range(2, 2**w):
+        X, Y, Z = jacobian_add_affine(X, Y, Z, x, y)
+        points.append((X, Y, Z))
+    z_invs = batch_inverse([Z for _, _, Z in points], P)
+    table = [(X * z_inv * z_inv % P, Y * z_inv * z_inv * z_inv % P) for (X, Y, _), z_inv in zip(points, z_invs)]
+    return [table[0]] + table
+
+def g_fixed_table():
+    global G_FIXED_TABLE
+    if G_FIXED_TABLE is None:
+        G_FIXED_TABLE = fixed_window_table(G)
+    return G_FIXED_TABLE
+
+def fixed_window_mul(coefficient, table, w=FIXED_WINDOW):
+    #coefficient*P in coordinate jacobiane, con la tabella di P costruita da fixed_window_table
+    k = coefficient % N + N
+    k = (k, k + N)[k >> 256 == 0]       #257 bit in ogni caso
+    mask = 2**w - 1
+    top = w * (256 // w)        #la posizione del primo blocco, che contiene il bit 256
+    X, Y = table[k >> top]
+    Z = 1
+    for shift in range(top - w, -1, -w):
+        for _ in range(w):
+            X, Y, Z = jacobian_double(X, Y, Z)
+        digit = (k >> shift) & mask
+        added = jacobian_add_affine(X, Y, Z, *table[digit])
+        X, Y, Z = ((X, Y, Z), added)[digit != 0]        #la somma si fa sempre, il risultato si tiene solo se il blocco non è nullo
+    return X, Y, Z
+
+"""
+PrivateKey usa la finestra fissa sia per calcolare la chiave pubblica sia per k*G nella firma. La tabella di G la costruiamo una volta
+sola, alla prima chiave creata. Il resto della firma non cambia:
+"""
+
+class PrivateKey:
+    def __init__(self, secret):
+        self.secret = secret
+        self.point = from_jacobian(*fixed_window_mul(secret, g_fixed_table()))
+
+    def sign(self, z):
+        k = self.deterministic_k(z)
+        r = from_jacobian(*fixed_window_mul(k, g_fixed_table())).x.num
+        k_inv = pow(k, N - 2, N)
+        s = (z + r * self.secret) * k_inv % N
+        if s > N // 2:
+            s = N - s
+        return Signature(r, s)
+    #...
+
+def benchmark_fixed_window(count=200):
+    #operazioni al secondo della finestra fissa, delle moltiplicazioni a tempo variabile e di firma e verifica
+    coefficients = [int.from_bytes(hash256(i.to_bytes(4, 'big')), 'big') % N for i in range(count)]
+    key = PrivateKey(coefficients[0])
+    sig = key.sign(1000)
+    point = key.point
+    table = g_fixed_table()
+    timings = {
+        'fixed_window': timeit(lambda: [fixed_window_mul(k, table) for k in coefficients], number=1),
+        'generator_mul': timeit(lambda: [generator_mul(k) for k in coefficients], number=1),
+        'jacobian_mul': timeit(lambda: [jacobian_mul(k, G) for k in coefficients], number=1),
+        'sign': timeit(lambda: [key.sign(k) for k in coefficients], number=1),
+        'verify': timeit(lambda: [point.verify_uncached(1000, sig) for _ in coefficients], number=1),
+    }
+    return {name: count / seconds for name, seconds in timings.items()}
+
+"""
+>>> PrivateKey(12345).point == 12345 * G
+True
+>>> benchmark_fixed_window()
+{'fixed_window': 750, 'generator_mul': 3100, 'jacobian_mul': 630, 'sign': 575, 'verify': 550}
+
+(operazioni al secondo, arrotondate, CPython 3.11). La finestra fissa è circa il 20% più veloce del double-and-add di jacobian_mul, ma
+circa quattro volte più lenta della tabella di G, che non fa raddoppi: è il prezzo della sequenza uniforme, e la firma passa da circa
+1200 a circa 575 al secondo. Le verifiche restano sul percorso a tempo variabile, dove non c'è nessun segreto da proteggere.
+"""
@@ -0,0 +1,157 @@
+"""
+COORDINATE JACOBIANE
+
+Il metodo __rmul__ di S256Point che abbiamo scritto nel capitolo 3 usa l'espansione binaria (double-and-add) appoggiandosi a Point.__add__.
+Ogni somma e ogni raddoppio calcolano il coefficiente angolare s con una divisione nel campo finito, e ogni divisione è un'inversione
+col piccolo teorema di Fermat, cioè un elevamento a potenza b^(p-2) con un esponente di 256 bit. Per una moltiplicazione scalare facciamo
+circa 256 raddoppi e in media 128 somme: quasi 400 esponenziazioni modulari per calcolare una sola chiave pubblica. È questo il collo di
+bottiglia di firma e verifica.
+
+L'idea è di rinviare la divisione. Invece di rappresentare un punto con le due coordinate affini (x, y), lo rappresentiamo con tre
+coordinate (X, Y, Z), dette jacobiane, legate alle affini da:
+x = X/Z^2, y = Y/Z^3
+Lo stesso punto ha infinite rappresentazioni jacobiane (basta moltiplicare X per l^2, Y per l^3 e Z per l), e il punto all'infinito è
+quello con Z = 0. Riscrivendo le formule di somma e raddoppio in queste coordinate, i denominatori finiscono tutti dentro Z e non serve
+più dividere: bastano moltiplicazioni e somme modulari, che costano pochissimo rispetto a un'inversione.
+Si torna alle coordinate affini una sola volta, alla fine della moltiplicazione scalare, con un'unica inversione di Z.
+
+Raddoppio (curva con a = 0, come secp256k1):
+A = X1^2, B = Y1^2, C = B^2
+D = 2*((X1 + B)^2 - A - C)
+E = 3*A, F = E^2
+X3 = F - 2*D
+Y3 = E*(D - X3) - 8*C
+Z3 = 2*Y1*Z1
+
+Somma di due punti (X1, Y1, Z1) + (X2, Y2, Z2):
+U1 = X1*Z2^2, U2 = X2*Z1^2, S1 = Y1*Z2^3, S2 = Y2*Z1^3
+H = U2 - U1, R = S2 - S1
+X3 = R^2 - H^3 - 2*U1*H^2
+Y3 = R*(U1*H^2 - X3) - S1*H^3
+Z3 = Z1*Z2*H
+Se H = 0 i due punti hanno la stessa x: se anche R = 0 sono lo stesso punto (e si raddoppia), altrimenti sono uno l'opposto dell'altro
+e il risultato è il punto all'infinito. Sono gli stessi casi particolari di Point.__add__.
+Se il secondo punto è affine (Z2 = 1) la formula si semplifica ("somma mista"), ed è proprio il caso del double-and-add, in cui sommiamo
+sempre il punto di partenza.
+
+Lavoriamo direttamente con gli interi modulo P invece che con oggetti S256Field: siamo nel ciclo più caldo del programma e non ha senso
+creare un oggetto e controllare che il prime coincida a ogni singola operazione.
+"""
+
+def jacobian_double(X1, Y1, Z1):
+    #raddoppio in coordinate jacobiane, nessuna inversione
+    if Z1 == 0 or Y1 == 0:      #il doppio dell'infinito (o di un punto con tangente verticale) è l'infinito
+        return 1, 1, 0
+    A = X1 * X1 % P
+    B = Y1 * Y1 % P
+    C = B * B % P
+    D = 2 * ((X1 + B) ** 2 - A - C) % P
+    E = 3 * A % P
+    X3 = (E * E - 2 * D) % P
+    Y3 = (E * (D - X3) - 8 * C) % P
+    Z3 = 2 * Y1 * Z1 % P
+    return X3, Y3, Z3
+
+def jacobian_add(X1, Y1, Z1, X2, Y2, Z2):
+    #somma di due punti jacobiani qualsiasi
+    if Z1 == 0:
+        return X2, Y2, Z2
+    if Z2 == 0:
+        return X1, Y1, Z1
+    Z1Z1 = Z1 * Z1 % P
+    Z2Z2 = Z2 * Z2 % P
+    U1 = X1 * Z2Z2 % P
+    U2 = X2 * Z1Z1 % P
+    S1 = Y1 * Z2 * Z2Z2 % P
+    S2 = Y2 * Z1 * Z1Z1 % P
+    H = (U2 - U1) % P
+    R = (S2 - S1) % P
+    if H == 0:
+        if R == 0:      #stesso punto: raddoppio
+            return jacobian_double(X1, Y1, Z1)
+        return 1, 1, 0      #punti opposti: infinito
+    HH = H * H % P
+    HHH = H * HH % P
+    V = U1 * HH % P
+    X3 = (R * R - HHH - 2 * V) % P
+    Y3 = (R * (V - X3) - S1 * HHH) % P
+    Z3 = Z1 * Z2 * H % P
+    return X3, Y3, Z3
+
+def jacobian_add_affine(X1, Y1, Z1, x2, y2):
+    #somma "mista": il secondo punto è affine (Z2 = 1), risparmiamo qualche moltiplicazione
+    if Z1 == 0:
+        return x2, y2, 1
+    Z1Z1 = Z1 * Z1 % P
+    U2 = x2 * Z1Z1 % P
+    S2 = y2 * Z1 * Z1Z1 % P
+    H = (U2 - X1) % P
+    R = (S2 - Y1) % P
+    if H == 0:
+        if R == 0:
+            return jacobian_double(X1, Y1, Z1)
+        return 1, 1, 0
+    HH = H * H % P
+    HHH = H * HH % P
+    V = X1 * HH % P
+    X3 = (R * R - HHH - 2 * V) % P
+    Y3 = (R * (V - X3) - Y1 * HHH) % P
+    Z3 = Z1 * H % P
+    return X3, Y3, Z3
+
+def to_jacobian(point):
+    #da S256Point a (X, Y, Z). L'infinito diventa (1, 1, 0)
+    if point.x is None:
+        return 1, 1, 0
+    return point.x.num, point.y.num, 1
+
+def from_jacobian(X, Y, Z):
+    #ritorno alle coordinate affini: l'unica inversione di tutta la moltiplicazione
+    if Z == 0:
+        return S256Point(None, None)
+    z_inv = pow(Z, P - 2, P)
+    z_inv2 = z_inv * z_inv % P
+    x = X * z_inv2 % P
+    y = Y * z_inv2 * z_inv % P
+    return S256Point(x, y)
+
+def jacobian_mul(coefficient, point):
+    #lo stesso double-and-add del capitolo 3, ma con i passaggi intermedi in coordinate jacobiane
+    if point.x is None:
+        return 1, 1, 0
+    x, y = point.x.num, point.y.num
+    X, Y, Z = 1, 1, 0       #si parte dallo 0 (punto all'infinito)
+    for bit in bin(coefficient)[2:]:        #scorriamo i bit dal più significativo, così sommiamo sempre il punto affine di partenza
+        X, Y, Z = jacobian_double(X, Y, Z)
+        if bit == '1':
+            X, Y, Z = jacobian_add_affine(X, Y, Z, x, y)
+    return X, Y, Z
+
+"""
+Rispetto al capitolo 3 scorriamo i bit da sinistra verso destra: così il punto da sommare è sempre lo stesso (self, affine) e possiamo
+usare la somma mista. Il risultato è identico, cambia solo l'ordine in cui vengono fatte le operazioni.
+A questo punto basta ridefinire __rmul__ in S256Point, e sia k*G che u*G + v*P continuano a funzionare senza toccare altro:
+"""
+
+class S256Point(Point):
+    #...
+    def __rmul__(self, coefficient):
+        coef = coefficient % N      #come prima, nG = 0
+        return from_jacobian(*jacobian_mul(coef, self))
+
+"""
+Possiamo controllare che i risultati siano identici alla versione affine e misurare il guadagno:
+
+>>> from timeit import timeit
+>>> e = 0x8ca63759c1157ebeaec0d03cecca119fc9a75bf8e6d0fa65c841c8e2738cdaec
+>>> Point.__rmul__(G, e) == e * G       #la versione del capitolo 3 contro quella jacobiana
+True
+>>> timeit(lambda: Point.__rmul__(G, e), number=20) / 20
+0.0717...
+>>> timeit(lambda: e * G, number=20) / 20
+0.0024...
+
+Con CPython 3.11 la moltiplicazione scalare passa da circa 72ms a circa 2.4ms, quasi 30 volte più veloce,
+e firma e verifica ne beneficiano nella stessa misura. Ogni raddoppio costa ora circa 6 moltiplicazioni modulari e ogni somma mista
+circa 11, contro un'esponenziazione da 256 bit (centinaia di moltiplicazioni) per ciascuna operazione nella versione affine.
+"""
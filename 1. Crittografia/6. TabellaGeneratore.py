@@ -0,0 +1,130 @@
+"""
+PRECOMPUTAZIONE DEI MULTIPLI DI G
+
+Con le coordinate jacobiane (vedi 5. CoordinateJacobiane) abbiamo eliminato quasi tutte le inversioni, ma k*G fa ancora circa 256 raddoppi
+e 128 somme per ogni firma e per ogni chiave pubblica derivata. Il punto G però non cambia mai: tutti i raddoppi che facciamo partendo da G
+sono sempre gli stessi, e possiamo calcolarli una volta sola.
+
+Dividiamo lo scalare k in finestre di w bit (w = 4 in questo esempio):
+k = d0 + d1*2^4 + d2*2^8 + ... + d63*2^252, con ogni cifra d_i compresa tra 0 e 15.
+Da cui:
+k*G = d0*G + d1*(2^4*G) + d2*(2^8*G) + ... + d63*(2^252*G)
+Se per ogni finestra i abbiamo già in una tabella i punti j*(2^(4i)*G) per j da 1 a 15, k*G si ottiene con al più 64 somme e zero raddoppi:
+per ogni finestra si legge la cifra e si somma il punto corrispondente della tabella (se la cifra è 0 non si somma niente).
+La tabella ha 64*15 = 960 punti. I punti sono memorizzati in forma affine, così ogni somma è una somma mista, la più economica.
+
+La tabella viene costruita la prima volta che serve (una volta per processo) e, se lo si desidera, salvata su disco: ogni punto occupa
+64 byte (x e y big-endian da 32 byte, come nel formato SEC non compresso senza prefisso) e rileggerla costa molto meno che ricalcolarla.
+"""
+
+import os
+
+G_WINDOW = 4            #larghezza della finestra in bit. Con 8 le somme scendono a 32, ma la tabella passa a 8160 punti
+G_TABLE_PATH = None     #se impostato, la tabella viene letta da (o scritta su) questo file
+G_TABLE = None          #la tabella, costruita solo al primo utilizzo
+
+def build_g_table():
+    #per ogni finestra i, la lista dei punti affini j*(2^(G_WINDOW*i))*G con j = 1 ... 2^G_WINDOW - 1
+    table = []
+    base = to_jacobian(G)
+    for i in range(-(-256 // G_WINDOW)):
+        row = []
+        current = base
+        for j in range(1, 2**G_WINDOW):
+            row.append(current)
+            current = jacobian_add(*current, *base)
+        table.append([(p.x.num, p.y.num) for p in (from_jacobian(*q) for q in row)])
+        base = current      #dopo il ciclo current = 2^G_WINDOW * base, il punto base della finestra successiva
+    return table
+
+def save_g_table(table, path):
+    #scriviamo su un file temporaneo e poi lo rinominiamo: più processi (vedi 11. FirmaParallela) possono condividere lo stesso path,
+    #e nessuno deve mai leggere un file scritto a metà
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes([G_WINDOW]))      #il primo byte è la larghezza della finestra
+        for row in table:
+            for x, y in row:
+                f.write(x.to_bytes(32, 'big') + y.to_bytes(32, 'big'))
+    os.replace(tmp_path, path)
+
+def load_g_table(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 1 or data[0] != G_WINDOW:
+        raise ValueError('G table in {} is corrupted or has a different window'.format(path))
+    per_row = 2**G_WINDOW - 1
+    rows = -(-256 // G_WINDOW)
+    if len(data) != 1 + rows * per_row * 64:
+        raise ValueError('G table in {} is corrupted or has a different window'.format(path))
+    table = []
+    offset = 1
+    for i in range(rows):
+        row = []
+        for j in range(per_row):
+            x = int.from_bytes(data[offset:offset + 32], 'big')
+            y = int.from_bytes(data[offset + 32:offset + 64], 'big')
+            if (y * y - x * x * x - B) % P != 0:        #non ci fidiamo ciecamente del file: ogni punto deve stare sulla curva
+                raise ValueError('({}, {}) is not on the curve'.format(x, y))
+            row.append((x, y))
+            offset += 64
+        table.append(row)
+    #stare sulla curva non basta: ogni punto deve essere proprio il multiplo atteso. Nella riga i il punto j+1 è il punto j più il primo
+    #della riga, e il primo della riga dopo è l'ultimo più il primo. Confrontiamo in coordinate jacobiane, senza inversioni:
+    #(X, Y, Z) è il punto affine (x, y) se X = x*Z^2 e Y = y*Z^3
+    X, Y, Z = G.x.num, G.y.num, 1
+    for i, row in enumerate(table):
+        for j, (x, y) in enumerate(row):
+            ZZ = Z * Z % P
+            if Z == 0 or X != x * ZZ % P or Y != y * ZZ * Z % P:
+                raise ValueError('G table in {} has a wrong point in row {}, column {}'.format(path, i, j))
+            X, Y, Z = jacobian_add_affine(x, y, 1, *row[0])
+    return table
+
+def g_table():
+    #restituisce la tabella, costruendola (o leggendola da disco) solo la prima volta
+    global G_TABLE
+    if G_TABLE is None:
+        if G_TABLE_PATH is not None and os.path.exists(G_TABLE_PATH):
+            try:
+                G_TABLE = load_g_table(G_TABLE_PATH)
+            except ValueError:      #file rovinato o con un'altra finestra: lo ricostruiamo e lo riscriviamo
+                G_TABLE = None
+        if G_TABLE is None:
+            G_TABLE = build_g_table()
+            if G_TABLE_PATH is not None:
+                save_g_table(G_TABLE, G_TABLE_PATH)
+    return G_TABLE
+
+def generator_mul(coefficient):
+    #k*G in coordinate jacobiane usando solo somme miste
+    table = g_table()
+    mask = 2**G_WINDOW - 1
+    X, Y, Z = 1, 1, 0
+    for row in table:
+        digit = coefficient & mask
+        if digit:
+            X, Y, Z = jacobian_add_affine(X, Y, Z, *row[digit - 1])
+        coefficient >>= G_WINDOW
+    return X, Y, Z
+
+"""
+Non resta che usare la tabella in automatico quando il punto da moltiplicare è G:
+"""
+
+class S256Point(Point):
+    #...
+    def __rmul__(self, coefficient):
+        coef = coefficient % N
+        if self == G:       #firma e derivazione delle chiavi pubbliche passano tutte da qui
+            return from_jacobian(*generator_mul(coef))
+        return from_jacobian(*jacobian_mul(coef, self))
+
+"""
+>>> e = 0x8ca63759c1157ebeaec0d03cecca119fc9a75bf8e6d0fa65c841c8e2738cdaec
+>>> from_jacobian(*jacobian_mul(e, G)) == e * G
+True
+
+Costruire la tabella costa circa quanto 80 moltiplicazioni scalari (rileggerla da disco quanto una sola), e da quel momento k*G
+costa circa 4 volte meno della versione jacobiana del capitolo precedente.
+"""
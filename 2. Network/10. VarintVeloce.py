@@ -0,0 +1,183 @@
+"""
+VARINT E INTERI LITTLE-ENDIAN CON STRUCT
+
+Il parsing e la serializzazione delle transazioni sono fatti quasi solo di interi little-endian di 2, 4 e 8 byte e di varint: versione,
+numero di input, indice, lunghezza dello script, sequence, amount, locktime. Finora li abbiamo letti con little_endian_to_int e
+read_varint (2. Transazioni): per ogni campo una chiamata a una funzione nostra, una s.read() che crea un nuovo bytes e una chiamata a
+int.from_bytes. Per un varint le read sono due, una per il primo byte e una per il resto.
+
+Il modulo struct della libreria standard converte byte e interi secondo un "formato": '<I' è un intero senza segno di 4 byte
+little-endian, '<Q' di 8, '<BH' un byte seguito da un intero di 2 byte. Con struct.Struct il formato viene analizzato una volta sola, e
+i metodi dell'oggetto fanno tutto in C:
+- pack(...) restituisce i byte, anche di più campi insieme;
+- unpack_from(buf, offset) legge direttamente dalla posizione offset di un buffer (bytes, bytearray, memoryview, mmap), senza fare
+  prima lo slice.
+Questo è lo strato comune su cui riscriviamo parse, parse_buffer (4. ParserZeroCopy) e serialize di Tx, TxIn e TxOut. Nei parser a
+stream approfittiamo anche del fatto che dopo un campo a lunghezza fissa viene quasi sempre un varint: leggiamo insieme il campo e il
+primo byte del varint, e lo script insieme alla sequence che lo segue, così le read per input scendono da cinque a tre.
+"""
+
+import struct
+
+UINT16 = struct.Struct('<H')
+UINT32 = struct.Struct('<I')
+UINT64 = struct.Struct('<Q')
+VARINT16 = struct.Struct('<BH')     #il prefisso 0xfd e il numero
+VARINT32 = struct.Struct('<BI')
+VARINT64 = struct.Struct('<BQ')
+VARINT_TAILS = {0xfd: UINT16, 0xfe: UINT32, 0xff: UINT64}      #per ogni prefisso, come leggere i byte che lo seguono
+OUTPOINT = struct.Struct('<32sI')       #id della transazione precedente e indice
+UINT32_BYTE = struct.Struct('<IB')      #versione e primo byte del numero di input
+UINT64_BYTE = struct.Struct('<QB')      #amount e primo byte della lunghezza dello script
+SINGLE_BYTES = [bytes([i]) for i in range(256)]
+
+def read_varint_tail(s, i):
+    #completa dallo stream un varint di cui abbiamo già letto il primo byte i
+    if i < 0xfd:
+        return i
+    tail = VARINT_TAILS[i]
+    return tail.unpack(s.read(tail.size))[0]
+
+def read_varint(s):
+    '''read_varint reads a variable integer from a stream'''
+    i = s.read(1)[0]
+    if i < 0xfd:
+        return i
+    tail = VARINT_TAILS[i]
+    return tail.unpack(s.read(tail.size))[0]
+
+def read_varint_from(buf, offset):
+    #restituisce il numero e l'offset del byte successivo
+    i = buf[offset]
+    if i < 0xfd:
+        return i, offset + 1
+    tail = VARINT_TAILS[i]
+    return tail.unpack_from(buf, offset + 1)[0], offset + 1 + tail.size
+
+def read_varints(buf, offset, count):
+    #count varint consecutivi: restituisce la lista dei numeri e l'offset dopo l'ultimo
+    result = []
+    append = result.append
+    for _ in range(count):
+        i = buf[offset]
+        if i < 0xfd:
+            append(i)
+            offset += 1
+        else:
+            tail = VARINT_TAILS[i]
+            append(tail.unpack_from(buf, offset + 1)[0])
+            offset += 1 + tail.size
+    return result, offset
+
+def encode_varint(i):
+    '''encodes an integer as a varint'''
+    if i < 0xfd:
+        return SINGLE_BYTES[i]
+    elif i < 0x10000:
+        return VARINT16.pack(0xfd, i)
+    elif i < 0x100000000:
+        return VARINT32.pack(0xfe, i)
+    elif i < 0x10000000000000000:
+        return VARINT64.pack(0xff, i)
+    else:
+        raise ValueError('integer too large: {}'.format(i))
+
+"""
+Gli stessi parser di prima, riscritti sopra questi formati. Se il buffer finisce a metà di un campo, unpack_from solleva struct.error.
+"""
+
+class TxIn:
+    #...
+    @classmethod
+    def parse(cls, s):
+        prev_tx, prev_index = OUTPOINT.unpack(s.read(36))
+        length = read_varint(s)
+        data = s.read(length + 4)       #lo script e la sequence con una sola read
+        return cls(prev_tx[::-1], prev_index, data[:length], UINT32.unpack_from(data, length)[0])
+
+    @classmethod
+    def parse_buffer(cls, buf, offset):
+        prev_tx, prev_index = OUTPOINT.unpack_from(buf, offset)
+        length, offset = read_varint_from(buf, offset + 36)
+        script_sig = memoryview(buf)[offset:offset + length]
+        offset += length
+        return cls(prev_tx[::-1], prev_index, script_sig, UINT32.unpack_from(buf, offset)[0]), offset + 4
+
+    def serialize(self):
+        return (OUTPOINT.pack(self.prev_tx[::-1], self.prev_index) + encode_varint(len(self.script_sig))
+                + self.script_sig + UINT32.pack(self.sequence))
+
+class TxOut:
+    #...
+    @classmethod
+    def parse(cls, s):
+        amount, i = UINT64_BYTE.unpack(s.read(9))
+        return cls(amount, s.read(read_varint_tail(s, i)))
+
+    @classmethod
+    def parse_buffer(cls, buf, offset):
+        amount = UINT64.unpack_from(buf, offset)[0]
+        length, offset = read_varint_from(buf, offset + 8)
+        return cls(amount, memoryview(buf)[offset:offset + length]), offset + length
+
+    def serialize(self):
+        return UINT64.pack(self.amount) + encode_varint(len(self.script_pubkey)) + self.script_pubkey
+
+class Tx:
+    #...
+    @classmethod
+    def parse(cls, s, testnet=False):
+        version, i = UINT32_BYTE.unpack(s.read(5))
+        inputs = [TxIn.parse(s) for _ in range(read_varint_tail(s, i))]
+        outputs = [TxOut.parse(s) for _ in range(read_varint(s))]
+        locktime = UINT32.unpack(s.read(4))[0]
+        return cls(version, inputs, outputs, locktime, testnet=testnet)
+
+    @classmethod
+    def parse_buffer(cls, buf, offset=0, testnet=False):
+        start = offset
+        version = UINT32.unpack_from(buf, offset)[0]
+        segwit = buf[offset + 4] == 0 and buf[offset + 5] == 1      #marker e flag, vedi 4. ParserZeroCopy
+        if segwit:
+            offset += 2
+        num_inputs, offset = read_varint_from(buf, offset + 4)
+        inputs = []
+        for _ in range(num_inputs):
+            tx_in, offset = TxIn.parse_buffer(buf, offset)
+            inputs.append(tx_in)
+        num_outputs, offset = read_varint_from(buf, offset)
+        outputs = []
+        for _ in range(num_outputs):
+            tx_out, offset = TxOut.parse_buffer(buf, offset)
+            outputs.append(tx_out)
+        outputs_end = offset
+        if segwit:
+            for tx_in in inputs:
+                tx_in.witness, offset = read_witness_from(buf, offset)
+        if offset + 4 > len(buf):
+            raise ValueError('transaction ends after the end of the buffer')
+        locktime = UINT32.unpack_from(buf, offset)[0]
+        view = memoryview(buf)
+        if not view.readonly:       #vedi 4. ParserZeroCopy: niente finestre su un buffer che può cambiare
+            return cls.parse_buffer(bytes(view[start:offset + 4]), testnet=testnet)[0], offset + 4
+        tx = cls(version, inputs, outputs, locktime, testnet=testnet)
+        if segwit:
+            tx.raw = b''.join((view[start:start + 4], view[start + 6:outputs_end], view[offset:offset + 4]))
+        else:
+            tx.raw = view[start:offset + 4]
+        return tx, offset + 4
+
+"""
+>>> read_varints(bytes.fromhex('64fd2b02fe7f110100ff6dc7ed3e60100000'), 0, 4)
+([100, 555, 70015, 18005558675309], 18)
+>>> encode_varint(70015).hex()
+'fe7f110100'
+>>> Tx.parse(BytesIO(raw)).id()         #la transazione dell'esempio in 4. ParserZeroCopy
+'452c629d67e41baec3ac6f04fe744b4b9617f8f859c63b3002f8684e7a4fee03'
+
+Con CPython 3.11 leggere un intero di 4 byte con UINT32.unpack_from(buf, offset) costa circa 0.1µs, contro circa 0.45µs di
+little_endian_to_int(buf[offset:offset + 4]), e encode_varint passa da circa 0.37µs a circa 0.28µs. Su una transazione intera il
+guadagno è più piccolo, perché il tempo va soprattutto nella creazione degli oggetti TxIn e TxOut: parse e parse_buffer migliorano di
+circa il 10-15%, la serializzazione di input e output passa da circa 4.3µs a circa 3.5µs. read_varint su uno stream resta quasi uguale:
+lì il costo è quello delle read.
+"""
@@ -0,0 +1,184 @@
+"""
+SERIALIZZAZIONE IN UN BUFFER UNICO
+
+Tx.serialize_fields (vedi 5. CacheTxid) costruisce la transazione concatenando pezzi: ogni input e ogni output crea i suoi bytes, che
+poi vengono ricopiati nel risultato, e ogni += copia di nuovo tutto quello che c'è già. Per una transazione con migliaia di input
+diventano molte copie, e per scriverla su un file o su un socket ne facciamo un'altra ancora.
+
+Conoscendo in anticipo la dimensione esatta possiamo invece allocare un solo bytearray e scriverci dentro ogni campo al suo posto, con
+i pack_into degli struct di 10. VarintVeloce, che scrivono direttamente a un offset di un buffer esistente. La dimensione si calcola
+senza serializzare niente:
+    4 (versione) + varint(numero di input) + somma degli input + varint(numero di output) + somma degli output + 4 (locktime)
+con ogni input lungo 32 + 4 + varint(lunghezza script) + script + 4, e ogni output 8 + varint(lunghezza script) + script.
+La dimensione serve anche da sola: la fee rate in satoshi per byte è la fee divisa per la dimensione, e per calcolarla non serve avere
+i byte della transazione.
+
+Tx.serialize_into(buf, offset) scrive la transazione in un buffer che esiste già (per esempio uno riutilizzato per tutte le
+transazioni di un blocco) e restituisce l'offset a cui finisce.
+"""
+
+def varint_size(i):
+    if i < 0xfd:
+        return 1
+    elif i < 0x10000:
+        return 3
+    elif i < 0x100000000:
+        return 5
+    return 9
+
+def write_varint_into(buf, offset, i):
+    #come encode_varint, ma scrive a offset e restituisce l'offset successivo
+    if i < 0xfd:
+        buf[offset] = i
+        return offset + 1
+    elif i < 0x10000:
+        VARINT16.pack_into(buf, offset, 0xfd, i)
+        return offset + 3
+    elif i < 0x100000000:
+        VARINT32.pack_into(buf, offset, 0xfe, i)
+        return offset + 5
+    elif i < 0x10000000000000000:
+        VARINT64.pack_into(buf, offset, 0xff, i)
+        return offset + 9
+    else:
+        raise ValueError('integer too large: {}'.format(i))
+
+class TxIn:
+    #...
+    def serialized_size(self):
+        length = len(self.script_sig)
+        return 40 + varint_size(length) + length
+
+    def serialize_into(self, buf, offset):
+        OUTPOINT.pack_into(buf, offset, self.prev_tx[::-1], self.prev_index)
+        length = len(self.script_sig)
+        offset = write_varint_into(buf, offset + 36, length)
+        buf[offset:offset + length] = self.script_sig
+        offset += length
+        UINT32.pack_into(buf, offset, self.sequence)
+        return offset + 4
+
+class TxOut:
+    #...
+    def serialized_size(self):
+        length = len(self.script_pubkey)
+        return 8 + varint_size(length) + length
+
+    def serialize_into(self, buf, offset):
+        UINT64.pack_into(buf, offset, self.amount)
+        length = len(self.script_pubkey)
+        offset = write_varint_into(buf, offset + 8, length)
+        buf[offset:offset + length] = self.script_pubkey
+        return offset + length
+
+"""
+Se la transazione ha già i suoi byte in tx.raw (perché viene da parse_buffer o è già stata serializzata) la dimensione è len(tx.raw) e
+serialize_into li copia in un colpo solo.
+
+Quando invece serve un bytes nuovo, in CPython la cosa più veloce non è il bytearray ma b''.join: raccoglie i pezzi in una lista,
+calcola la lunghezza totale e copia ogni pezzo una volta sola. serialize_fields lo usiamo così al posto dei +=, che con molti input
+ricopiavano ogni volta tutto il risultato parziale.
+"""
+
+class Tx:
+    #...
+    def serialized_size(self):
+        if self.raw is not None:
+            return len(self.raw)
+        return (8 + varint_size(len(self.tx_ins)) + sum(tx_in.serialized_size() for tx_in in self.tx_ins)
+                + varint_size(len(self.tx_outs)) + sum(tx_out.serialized_size() for tx_out in self.tx_outs))
+
+    def fee_rate(self, fee):
+        #satoshi per byte, data la fee in satoshi
+        return fee / self.serialized_size()
+
+    def serialize_into(self, buf, offset=0):
+        #il buffer deve avere almeno serialized_size() byte a partire da offset
+        if offset + self.serialized_size() > len(buf):
+            raise ValueError('buffer too small for the transaction')
+        if self.raw is not None:
+            end = offset + len(self.raw)
+            buf[offset:end] = self.raw
+            return end
+        UINT32.pack_into(buf, offset, self.version)
+        offset = write_varint_into(buf, offset + 4, len(self.tx_ins))
+        for tx_in in self.tx_ins:
+            offset = tx_in.serialize_into(buf, offset)
+        offset = write_varint_into(buf, offset, len(self.tx_outs))
+        for tx_out in self.tx_outs:
+            offset = tx_out.serialize_into(buf, offset)
+        UINT32.pack_into(buf, offset, self.locktime)
+        return offset + 4
+
+    def serialize_fields(self):
+        parts = [UINT32.pack(self.version), encode_varint(len(self.tx_ins))]
+        parts += [tx_in.serialize() for tx_in in self.tx_ins]
+        parts.append(encode_varint(len(self.tx_outs)))
+        parts += [tx_out.serialize() for tx_out in self.tx_outs]
+        parts.append(UINT32.pack(self.locktime))
+        return b''.join(parts)
+
+"""
+Per scrivere tante transazioni su un file o su un socket usiamo un TxWriter: le serializza una dopo l'altra nello stesso bytearray e
+chiama stream.write solo quando il buffer è pieno, o alla fine. Una transazione più grande del buffer viene scritta da sola, in un
+buffer allocato apposta.
+"""
+
+class TxWriter:
+
+    def __init__(self, stream, buffer_size=1 << 16):
+        self.stream = stream        #qualsiasi oggetto con un metodo write: un file aperto in 'wb', socket.makefile('wb'), BytesIO
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.offset = 0
+        self.written = 0        #byte scritti in tutto
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def write(self, tx):
+        size = tx.serialized_size()
+        if self.offset + size > len(self.buffer):
+            self.flush()
+        if size > len(self.buffer):
+            buf = bytearray(size)
+            tx.serialize_into(buf)
+            self.stream.write(buf)
+        else:
+            self.offset = tx.serialize_into(self.buffer, self.offset)
+        self.written += size
+        return size
+
+    def write_all(self, txs):
+        for tx in txs:
+            self.write(tx)
+
+    def flush(self):
+        if self.offset:
+            self.stream.write(self.view[:self.offset])
+            self.offset = 0
+
+"""
+>>> tx, _ = Tx.parse_buffer(raw)        #la transazione dell'esempio in 4. ParserZeroCopy
+>>> tx.invalidate()                     #dimentichiamo i byte letti, per calcolare tutto dai campi
+>>> tx.serialized_size(), tx.fee_rate(40000)
+(226, 176.99115044247787)
+>>> buf = bytearray(1000)
+>>> tx.serialize_into(buf, 100)
+326
+>>> bytes(buf[100:326]) == raw
+True
+>>> out = BytesIO()
+>>> with TxWriter(out) as writer:
+...     writer.write_all([tx] * 3)
+>>> out.getvalue() == raw * 3
+True
+
+Con CPython 3.11, su questa transazione serialized_size() costa circa 1.1µs contro circa 2.1µs di serialize_fields(), e non crea
+nessun bytes. Con 3000 input e 30 output serialize_fields() passa da circa 30ms a circa 2ms, perché i += erano quadratici;
+serialize_into sulla stessa transazione costa circa 4.5ms, quindi conviene solo quando il buffer c'è già e si vuole evitare una copia,
+come nel TxWriter.
+"""
@@ -0,0 +1,221 @@
+"""
+LETTURA IN BLOCCO DEI FILE blk*.dat
+
+Finora abbiamo letto una transazione alla volta. Per reindicizzare la blockchain a partire dai file locali del nodo serve leggere milioni
+di transazioni di fila. Bitcoin Core salva i blocchi nei file blocks/blk00000.dat, blk00001.dat e così via, uno dopo l'altro, ognuno
+nella forma:
+1. magic, 4 byte che identificano la rete (f9beb4d9 per mainnet, 0b110907 per testnet)
+2. lunghezza del blocco, 4 byte little-endian
+3. il blocco: header di 80 byte, numero di transazioni come varint e poi le transazioni serializzate una dopo l'altra
+Alla fine del file ci possono essere degli zeri: Core alloca lo spazio in anticipo, quindi un magic nullo vuol dire che il file è finito.
+
+Apriamo il file con mmap: il sistema operativo ci dà il contenuto del file come se fosse un bytearray in memoria, caricando le pagine
+solo quando servono. Su questo buffer possiamo usare direttamente Tx.parse_buffer (vedi 4. ParserZeroCopy), senza leggere il file a
+pezzi e senza copiarlo. Le transazioni vengono restituite una alla volta da un generatore, così la memoria usata non dipende dalla
+dimensione del file.
+
+Il parsing è lavoro Python puro, quindi gira su un solo core per via del GIL. Se vogliamo usarne di più possiamo distribuire i blocchi
+a un pool di processi: ogni processo riapre il file per conto suo, legge il blocco che gli viene assegnato e restituisce le transazioni.
+Mandare indietro gli oggetti Tx al processo principale vuol dire serializzarli con pickle, e questo costa quasi quanto il parsing. Il
+pool conviene quindi soprattutto se gli passiamo anche una funzione "process" da applicare a ogni transazione direttamente nel processo
+che la legge (per esempio per calcolarne solo l'id e gli output che ci interessano), così da rimandare indietro poco.
+"""
+
+import mmap
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+MAINNET_MAGIC = b'\xf9\xbe\xb4\xd9'
+TESTNET_MAGIC = b'\x0b\x11\x09\x07'
+BLOCK_HEADER_SIZE = 80
+
+class IngestStats:
+    #contatori per misurare la velocità di lettura
+    def __init__(self):
+        self.blocks = 0
+        self.txs = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    def __repr__(self):
+        report = self.report()
+        return '{} blocks, {} txs in {:.1f}s: {:.0f} tx/s, {:.1f} MB/s'.format(
+            self.blocks, self.txs, report['seconds'], report['tx_per_s'], report['mb_per_s'])
+
+    def report(self):
+        seconds = time.perf_counter() - self.start
+        return {
+            'blocks': self.blocks,
+            'txs': self.txs,
+            'bytes': self.bytes,
+            'seconds': seconds,
+            'tx_per_s': self.txs / seconds if seconds else 0.0,
+            'mb_per_s': self.bytes / seconds / 1e6 if seconds else 0.0,
+        }
+
+def block_records(buf, magic=MAINNET_MAGIC):
+    #generatore di (offset, lunghezza) di ogni blocco nel file
+    offset = 0
+    while offset + 8 <= len(buf):
+        record_magic = buf[offset:offset + 4]
+        if record_magic == b'\x00\x00\x00\x00':     #spazio preallocato: il file è finito
+            return
+        if record_magic != magic:
+            raise ValueError('bad magic {} at offset {}'.format(bytes(record_magic).hex(), offset))
+        length = int.from_bytes(buf[offset + 4:offset + 8], 'little')
+        offset += 8
+        if offset + length > len(buf):
+            raise ValueError('block at offset {} is truncated'.format(offset))
+        yield offset, length
+        offset += length
+
+def block_transactions(buf, offset, length, testnet=False):
+    #generatore delle transazioni del blocco che inizia a offset (saltando l'header). Le transazioni devono finire esattamente dove
+    #finisce il blocco: se non succede, il parsing è sbagliato (o il file è rovinato) e non possiamo fidarci di niente
+    end = offset + length
+    count, offset = read_varint_from(buf, offset + BLOCK_HEADER_SIZE)
+    for _ in range(count):
+        tx, offset = Tx.parse_buffer(buf, offset, testnet=testnet)
+        if offset > end:
+            raise ValueError('transaction at offset {} ends after the end of the block'.format(offset))
+        yield tx
+    if offset != end:
+        raise ValueError('block at offset {} has {} bytes after its transactions'.format(end - length, end - offset))
+
+WORKER_FILES = {}       #in ogni processo del pool, i file già mappati
+
+def parse_block_worker(path, offset, length, testnet, process):
+    #gira in un processo del pool: legge un blocco e restituisce le transazioni (o il risultato di process su ognuna)
+    if path not in WORKER_FILES:
+        with open(path, 'rb') as f:
+            WORKER_FILES[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    txs = block_transactions(WORKER_FILES[path], offset, length, testnet=testnet)
+    if process is None:
+        return list(txs)
+    return [process(tx) for tx in txs]
+
+def ingest_file(path, magic=MAINNET_MAGIC, testnet=False, processes=None, process=None, stats=None):
+    '''generatore delle transazioni di un file blk*.dat, in ordine.
+    processes: numero di processi del pool (None per leggere tutto nel processo corrente)
+    process: funzione facoltativa da applicare a ogni transazione, nel processo che la legge
+    stats: un IngestStats da aggiornare'''
+    if stats is None:
+        stats = IngestStats()
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if processes is None:
+            for offset, length in block_records(buf, magic):
+                stats.blocks += 1
+                stats.bytes += length + 8
+                for tx in block_transactions(buf, offset, length, testnet=testnet):
+                    stats.txs += 1
+                    yield tx if process is None else process(tx)
+            return
+        with ProcessPoolExecutor(processes) as executor:
+            pending = deque()
+            records = block_records(buf, magic)
+            #teniamo in volo al massimo due blocchi per processo: executor.map li sottometterebbe tutti subito
+            for offset, length in records:
+                pending.append((length, executor.submit(parse_block_worker, path, offset, length, testnet, process)))
+                if len(pending) >= 2 * processes:
+                    yield from collect_block(pending.popleft(), stats)
+            while pending:
+                yield from collect_block(pending.popleft(), stats)
+    finally:
+        try:
+            buf.close()
+        except BufferError:     #qualche transazione letta è ancora in uso e punta al file: lo chiuderà il garbage collector
+            pass
+
+def collect_block(item, stats):
+    length, future = item
+    results = future.result()
+    stats.blocks += 1
+    stats.bytes += length + 8
+    stats.txs += len(results)
+    return results
+
+def ingest_files(paths, **kwargs):
+    #più file uno dopo l'altro (per esempio sorted(glob('blocks/blk*.dat'))), con un unico IngestStats
+    stats = kwargs.pop('stats', None) or IngestStats()
+    for path in paths:
+        yield from ingest_file(path, stats=stats, **kwargs)
+
+"""
+Perché le transazioni possano tornare dal pool al processo principale devono poter essere serializzate con pickle. I memoryview (gli
+script e gli elementi del witness) non lo sono, e nemmeno i riferimenti deboli con cui input e output avvisano la loro transazione (vedi
+5. CacheTxid): li convertiamo in bytes e rimettiamo a posto i riferimenti quando la transazione viene ricostruita.
+"""
+
+class Tx:
+    #...
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if state.get('raw') is not None:
+            state['raw'] = bytes(state['raw'])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for item in self.tx_ins + self.tx_outs:
+            item.__dict__['owner'] = weakref.ref(self)
+
+class TxIn:
+    #...
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('owner', None)
+        state['script_sig'] = bytes(state['script_sig'])
+        if 'witness' in state:
+            state['witness'] = [bytes(item) for item in state['witness']]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+class TxOut:
+    #...
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('owner', None)
+        state['script_pubkey'] = bytes(state['script_pubkey'])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+"""
+Quasi tutti i blocchi recenti contengono transazioni segwit: Tx.parse_buffer le riconosce dal marker e dal flag e ne salta il witness
+(vedi 4. ParserZeroCopy), e l'id è quello calcolato senza witness. Per provarlo costruiamo un blocco con la transazione dell'esempio in
+4. ParserZeroCopy e la stessa transazione in versione segwit, con un witness di due elementi per il suo input. Un blocco con un byte in
+più dopo le transazioni è rovinato:
+
+>>> witness = bytes([2, 3]) + b'abc' + bytes([1]) + b'd'
+>>> segwit_raw = raw[:4] + bytes([0, 1]) + raw[4:-4] + witness + raw[-4:]
+>>> block = bytes(BLOCK_HEADER_SIZE) + bytes([2]) + raw + segwit_raw
+>>> legacy, segwit = block_transactions(block, 0, len(block))
+>>> legacy.id() == segwit.id() == '452c629d67e41baec3ac6f04fe744b4b9617f8f859c63b3002f8684e7a4fee03'
+True
+>>> [bytes(item) for item in segwit.tx_ins[0].witness], legacy.tx_ins[0].witness
+([b'abc', b'd'], ())
+>>> list(block_transactions(block + b'\\x00', 0, len(block) + 1))
+Traceback (most recent call last):
+ValueError: block at offset 0 has 1 bytes after its transactions
+"""
+
+"""
+Un esempio di reindicizzazione che conta gli output e stampa la velocità raggiunta. La funzione process viene mandata ai processi
+del pool con pickle, quindi deve essere definita a livello di modulo (una lambda non va bene):
+
+def summary(tx):
+    return tx.id(), len(tx.tx_outs)
+
+>>> from glob import glob
+>>> stats = IngestStats()
+>>> outputs = 0
+>>> for txid, n in ingest_files(sorted(glob('blocks/blk*.dat')), processes=8, process=summary, stats=stats):
+...     outputs += n
+>>> print(stats)
+"""
@@ -0,0 +1,87 @@
+"""
+DERIVARE TANTI INDIRIZZI IN UNA VOLTA
+
+S256Point.address fa tre passi per ogni chiave: sec(), hash160() e encode_base58_checksum(). Per scansionare un wallet dobbiamo
+derivare gli indirizzi di centinaia di migliaia di chiavi, e facendolo una chiave alla volta ripetiamo ogni volta lavoro che si può
+condividere:
+1. se partiamo dalle chiavi private, ogni secret*G finisce con un'inversione per tornare in coordinate affini. Calcoliamo invece tutti i
+   prodotti in coordinate jacobiane con la tabella di G (vedi ../1. Crittografia/6. TabellaGeneratore) e li riportiamo in coordinate
+   affini tutti insieme, con una sola inversione (../1. Crittografia/9. InversioneBatch);
+2. dalle coordinate costruiamo direttamente i byte SEC, senza creare oggetti S256Point;
+3. hashlib.new('ripemd160') cerca ogni volta l'algoritmo per nome: prepariamo un oggetto ripemd160 vuoto una volta sola e lo copiamo;
+4. il prefisso della rete lo scegliamo una volta sola, e la codifica Base58 la facciamo con la versione batch di 7. Base58Veloce.
+Con tante chiavi possiamo infine dividere il lavoro tra più processi, come in ../1. Crittografia/11. FirmaParallela.
+"""
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+RIPEMD160 = hashlib.new('ripemd160')
+
+def affine_coordinates(items):
+    #items: chiavi private (int) o chiavi pubbliche (S256Point o coppie (x, y) di interi). Restituisce le coppie (x, y)
+    result = [None] * len(items)
+    positions = []
+    jacobian = []
+    for i, item in enumerate(items):
+        if isinstance(item, int):
+            X, Y, Z = generator_mul(item % N)
+            if Z == 0:
+                raise ValueError('secret {} is a multiple of N'.format(item))
+            positions.append(i)
+            jacobian.append((X, Y, Z))
+        elif isinstance(item, tuple):
+            result[i] = item
+        else:
+            result[i] = (item.x.num, item.y.num)
+    z_invs = batch_inverse([Z for _, _, Z in jacobian], P)
+    for i, (X, Y, _), z_inv in zip(positions, jacobian, z_invs):
+        z_inv2 = z_inv * z_inv % P
+        result[i] = (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+    return result
+
+def hash160_batch(secs):
+    sha256 = hashlib.sha256
+    results = []
+    for sec in secs:
+        h = RIPEMD160.copy()
+        h.update(sha256(sec).digest())
+        results.append(h.digest())
+    return results
+
+def derive_addresses_chunk(items, compressed=True, testnet=False):
+    coordinates = affine_coordinates(items)
+    if compressed:
+        secs = [(b'\x03' if y & 1 else b'\x02') + x.to_bytes(32, 'big') for x, y in coordinates]
+    else:
+        secs = [b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big') for x, y in coordinates]
+    prefix = b'\x6f' if testnet else b'\x00'
+    return encode_base58_checksum_batch([prefix + h160 for h160 in hash160_batch(secs)])
+
+def derive_addresses(items, compressed=True, testnet=False, processes=None, chunk_size=1000):
+    '''gli indirizzi di una lista di chiavi private o pubbliche, nello stesso ordine.
+    processes: numero di processi da usare (None per fare tutto nel processo corrente)'''
+    items = list(items)
+    if processes is None:
+        return derive_addresses_chunk(items, compressed, testnet)
+    #ai processi mandiamo solo interi: le chiavi pubbliche diventano coppie (x, y)
+    items = [item if isinstance(item, (int, tuple)) else (item.x.num, item.y.num) for item in items]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    addresses = []
+    with ProcessPoolExecutor(processes, initializer=init_worker) as executor:
+        for chunk in executor.map(derive_addresses_chunk, chunks, repeat(compressed), repeat(testnet)):
+            addresses.extend(chunk)
+    return addresses
+
+"""
+>>> derive_addresses([5002, 2020**5, 0x12345deadbeef], compressed=False, testnet=True)[0]
+'mmTPbXQFxboEtNRkwfh6K51jvdtHLxGeMA'
+>>> derive_addresses([PrivateKey(5002).point], compressed=False, testnet=True)
+['mmTPbXQFxboEtNRkwfh6K51jvdtHLxGeMA']
+
+Con CPython 3.11, partendo da 2000 chiavi private, si passa da circa 0.58ms a chiave con PrivateKey(secret).point.address() a circa
+0.51ms: il grosso resta la moltiplicazione secret*G, a cui risparmiamo solo l'inversione finale. Partendo da chiavi pubbliche già
+calcolate si passa da circa 10µs a circa 8.6µs a chiave, di cui quasi metà è la codifica Base58. Per andare davvero più veloci
+bisogna usare più core con processes.
+"""
@@ -0,0 +1,168 @@
+"""
+FIRME DER: PARSING RIGOROSO E SERIALIZZAZIONE IN UN PASSAGGIO
+
+Ogni firma che riceviamo, negli scriptSig delle transazioni, è in formato DER e va decodificata prima di poterla verificare.
+Signature.parse (vedi ../1. Crittografia/11. FirmaParallela) legge da un BytesIO e controlla solo la struttura generale, mentre
+Signature.der() (1. Serializzazione) converte r e s in 32 byte, toglie gli zeri iniziali con lstrip, aggiunge eventualmente lo zero
+davanti e concatena più volte i pezzi.
+
+Il parsing lo facciamo "rigoroso", con le regole che Bitcoin Core applica dal BIP66 in poi. Il formato DER permette di scrivere lo stesso
+numero in più modi (per esempio con zeri in più davanti) e una firma riscritta in un altro modo cambierebbe l'id della transazione
+senza invalidarla. Le regole sono:
+1. lunghezza totale tra 8 e 72 byte, primo byte 0x30, secondo byte uguale alla lunghezza del resto;
+2. r e s marcati da 0x02, con lunghezze non nulle che tornano esattamente con la lunghezza totale;
+3. r e s non negativi (il primo bit non può essere 1) e senza zeri superflui davanti (uno zero iniziale è ammesso solo se il byte dopo
+   ha il primo bit a 1).
+Leggiamo direttamente dal buffer per posizione, come in 4. ParserZeroCopy: così possiamo decodificare una firma che si trova in mezzo a
+uno script senza prima copiarla.
+
+Per serializzare, le lunghezze di r e s le ricaviamo da bit_length(): r occupa (bit di r + 8) // 8 byte, che include già lo zero da
+aggiungere quando il primo bit è 1. Sapendo le lunghezze scriviamo l'intestazione e i due numeri in un colpo solo.
+"""
+
+from timeit import timeit
+
+def decode_der(buf, offset=0, end=None):
+    #restituisce (r, s) della firma in buf[offset:end]
+    if end is None:
+        end = len(buf)
+    length = end - offset
+    if length < 8 or length > 72:
+        raise SyntaxError('Bad Signature Length')
+    if buf[offset] != 0x30 or buf[offset + 1] != length - 2 or buf[offset + 2] != 0x02:
+        raise SyntaxError('Bad Signature')
+    rlength = buf[offset + 3]
+    if rlength == 0 or rlength + 5 >= length or buf[offset + 4 + rlength] != 0x02:
+        raise SyntaxError('Bad Signature')
+    slength = buf[offset + 5 + rlength]
+    if slength == 0 or rlength + slength + 6 != length:
+        raise SyntaxError('Bad Signature Length')
+    r_start = offset + 4
+    s_start = offset + 6 + rlength
+    for start, n in ((r_start, rlength), (s_start, slength)):
+        if buf[start] & 0x80:
+            raise SyntaxError('Negative number in signature')
+        if n > 1 and buf[start] == 0 and not buf[start + 1] & 0x80:
+            raise SyntaxError('Superfluous zero in signature')
+    r = int.from_bytes(buf[r_start:r_start + rlength], 'big')
+    s = int.from_bytes(buf[s_start:s_start + slength], 'big')
+    return r, s
+
+def der_lengths(r, s):
+    return (r.bit_length() + 8) // 8, (s.bit_length() + 8) // 8
+
+def der_into(r, s, buf, offset=0):
+    #scrive la firma in un bytearray già allocato (almeno 72 byte liberi) e restituisce la posizione dopo l'ultimo byte scritto
+    rlength, slength = der_lengths(r, s)
+    s_start = offset + 6 + rlength
+    buf[offset:offset + 4] = bytes((0x30, 4 + rlength + slength, 2, rlength))
+    buf[offset + 4:s_start - 2] = r.to_bytes(rlength, 'big')
+    buf[s_start - 2] = 2
+    buf[s_start - 1] = slength
+    buf[s_start:s_start + slength] = s.to_bytes(slength, 'big')
+    return s_start + slength
+
+class Signature:
+    #...
+    def der(self):
+        rlength, slength = der_lengths(self.r, self.s)
+        return (bytes((0x30, 4 + rlength + slength, 2, rlength)) + self.r.to_bytes(rlength, 'big')
+                + bytes((2, slength)) + self.s.to_bytes(slength, 'big'))
+
+    def der_into(self, buf, offset=0):
+        return der_into(self.r, self.s, buf, offset)
+
+    @classmethod
+    def parse(cls, signature_bin):
+        return cls(*decode_der(signature_bin))
+
+"""
+Negli scriptSig la firma è uno degli elementi inseriti nello stack, seguita da un byte con il tipo di sighash (di solito 01, SIGHASH_ALL).
+Per estrarre le firme da tanti script in una volta scorriamo gli elementi di ogni script: i byte da 0x01 a 0x4b inseriscono
+direttamente quel numero di byte, 0x4c, 0x4d e 0x4e (OP_PUSHDATA1, 2 e 4) leggono prima la lunghezza, su 1, 2 o 4 byte. Gli elementi che
+cominciano con 0x30 e sono DER rigoroso sono firme; tutti gli altri (chiavi pubbliche, redeem script, opcode) li saltiamo.
+"""
+
+def script_sig_signatures(script_sigs):
+    #generatore di (indice dello script, Signature, sighash) per tutte le firme trovate, per esempio
+    #script_sig_signatures(tx_in.script_sig for tx in txs for tx_in in tx.tx_ins)
+    for i, script in enumerate(script_sigs):
+        offset = 0
+        while offset < len(script):
+            op = script[offset]
+            offset += 1
+            if 1 <= op <= 0x4b:
+                length = op
+            elif op == 0x4c:
+                if offset + 1 > len(script):        #manca il byte della lunghezza
+                    break
+                length = script[offset]
+                offset += 1
+            elif op == 0x4d:
+                length = int.from_bytes(script[offset:offset + 2], 'little')
+                offset += 2
+            elif op == 0x4e:
+                length = int.from_bytes(script[offset:offset + 4], 'little')
+                offset += 4
+            else:       #opcode senza dati
+                continue
+            end = offset + length
+            if end > len(script):       #script troncato: il resto non si può leggere
+                break
+            if length >= 9 and script[offset] == 0x30:
+                try:
+                    r, s = decode_der(script, offset, end - 1)      #l'ultimo byte è il sighash
+                except SyntaxError:
+                    pass
+                else:
+                    yield i, Signature(r, s), script[end - 1]
+            offset = end
+
+"""
+Per il confronto, la serializzazione di 1. Serializzazione come funzione:
+"""
+
+def lstrip_der(r, s):
+    rbin = r.to_bytes(32, byteorder='big').lstrip(b'\x00')
+    if rbin[0] & 0x80:
+        rbin = b'\x00' + rbin
+    result = bytes([2, len(rbin)]) + rbin
+    sbin = s.to_bytes(32, byteorder='big').lstrip(b'\x00')
+    if sbin[0] & 0x80:
+        sbin = b'\x00' + sbin
+    result += bytes([2, len(sbin)]) + sbin
+    return bytes([0x30, len(result)]) + result
+
+def benchmark_der(count=10000):
+    #microsecondi per firma: serializzazione vecchia e nuova, e parsing
+    sigs = [Signature(int.from_bytes(hash256(b'r' + i.to_bytes(4, 'big')), 'big') % N,
+                      int.from_bytes(hash256(b's' + i.to_bytes(4, 'big')), 'big') % N) for i in range(count)]
+    ders = [sig.der() for sig in sigs]
+    assert ders == [lstrip_der(sig.r, sig.s) for sig in sigs]
+    buf = bytearray(72)
+    timings = {
+        'lstrip_der': timeit(lambda: [lstrip_der(sig.r, sig.s) for sig in sigs], number=1),
+        'der': timeit(lambda: [sig.der() for sig in sigs], number=1),
+        'der_into': timeit(lambda: [sig.der_into(buf) for sig in sigs], number=1),
+        'parse': timeit(lambda: [Signature.parse(der) for der in ders], number=1),
+    }
+    return {name: seconds / count * 1e6 for name, seconds in timings.items()}
+
+"""
+>>> der = bytes.fromhex('3045022037206a0610995c58074999cb9767b87af4c4978db68c06e8e6e81d282047a7c60221008ca63759c1157ebeaec0d03cecca119fc9a75bf8e6d0fa65c841c8e2738cdaec')
+>>> sig = Signature.parse(memoryview(der))
+>>> sig.der() == der
+True
+>>> Signature.parse(bytes([0x30, 0x46, 2, 0x21, 0]) + der[4:])       #lo stesso r con uno zero in più: non è DER rigoroso
+Traceback (most recent call last):
+SyntaxError: Superfluous zero in signature
+>>> script_sig = bytes([len(der) + 1]) + der + b'\\x01'
+>>> [(i, sighash) for i, sig, sighash in script_sig_signatures([script_sig, b'\\x00', script_sig])]
+[(0, 1), (2, 1)]
+>>> benchmark_der()
+{'lstrip_der': 1.8, 'der': 0.75, 'der_into': 1.2, 'parse': 1.9}
+
+(microsecondi, arrotondati, CPython 3.11). der() costa circa la metà di prima. Scrivere in un bytearray già allocato con der_into è un
+po' più lento di der(), perché in CPython ogni assegnazione a una slice ha il suo costo: conviene quando il buffer esiste già, per
+esempio per serializzare uno script, così da non creare i bytes della firma per poi copiarli.
+"""
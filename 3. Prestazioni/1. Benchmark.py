@@ -0,0 +1,207 @@
+"""
+BENCHMARK DELLE OPERAZIONI PRINCIPALI
+
+Nei capitoli precedenti abbiamo reso più veloci molte operazioni, misurando i tempi a mano con timeit e scrivendoli nei commenti. Per
+accorgerci se una modifica peggiora qualcosa ci serve invece un modo ripetibile di misurare sempre le stesse operazioni, salvare i
+risultati e confrontarli con quelli di una versione precedente.
+
+Ogni benchmark è una funzione che prepara i dati e restituisce l'operazione da misurare, senza argomenti. Per ognuna misuriamo:
+1. le operazioni al secondo: timeit.Timer.autorange sceglie quante volte ripeterla perché una misura duri almeno 0.2 secondi, e delle
+   cinque misure teniamo la migliore, quella meno disturbata dal resto del sistema;
+2. la memoria: con tracemalloc il picco di memoria allocata durante una singola chiamata, e con sys.getallocatedblocks quanti blocchi di
+   memoria restano allocati in media dopo ogni chiamata. Il secondo numero dovrebbe essere 0: se cresce, l'operazione trattiene oggetti
+   (una cache, o peggio un leak).
+I risultati si salvano in JSON, e compare_results li confronta con quelli salvati in precedenza (la "baseline"), segnalando le operazioni
+diventate più lente oltre una certa tolleranza.
+
+Le verifiche e il parsing SEC sono misurati senza cache (verify_uncached e parse_sec), altrimenti dalla seconda ripetizione in poi
+misureremmo solo la ricerca nella cache.
+"""
+
+import json
+import platform
+import sys
+import time
+from timeit import Timer
+import tracemalloc
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    #decoratore che registra un benchmark
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+BENCH_SECRET = 0x8a1c5f3e2b7d4e9f0a6c3b8d5e2f7a4c1b9e6d3f0a7c4b1e8d5f2a9c6b3e0d7
+BENCH_Z = 0x231c6f3d980a6b0fb7152f85cee7eb52bf92433d9919b9c5218cb08e79cce78
+BENCH_TX = bytes.fromhex('0100000001813f79011acb80925dfe69b3def355fe914bd1d96a3f5f71bf8303c6a989c7d1000000006b483045022100ed81ff192e75a3fd2304004dcadb746fa5e24c5031ccfcf21320b0277457c98f02207a986d955c6e0cb35d446a89d3f56100f4d7f67801c31967743a9c8e10615bed01210349fc4e631e3624a545de3f89f5d8684c7b8138bd94bdd531d2e213bf016b278afeffffff02a135ef01000000001976a914bc3b654dca7e56b04dca18f2566cdaf02e8d9ada88ac99c39800000000001976a9141c4bc762dd5423e332166702cb75f40df79fea1288ac19430600')
+
+@benchmark('field_add')
+def bench_field_add():
+    a, b = S256Field(BENCH_SECRET), S256Field(BENCH_Z)
+    return lambda: a + b
+
+@benchmark('field_mul')
+def bench_field_mul():
+    a, b = S256Field(BENCH_SECRET), S256Field(BENCH_Z)
+    return lambda: a * b
+
+@benchmark('field_div')
+def bench_field_div():
+    a, b = S256Field(BENCH_SECRET), S256Field(BENCH_Z)
+    return lambda: a / b
+
+@benchmark('rmul_generator')
+def bench_rmul_generator():
+    return lambda: BENCH_SECRET * G
+
+@benchmark('rmul_point')
+def bench_rmul_point():
+    point = PrivateKey(BENCH_Z).point
+    return lambda: BENCH_SECRET * point
+
+@benchmark('deterministic_k')
+def bench_deterministic_k():
+    key = PrivateKey(BENCH_SECRET)
+    return lambda: key.deterministic_k(BENCH_Z)
+
+@benchmark('sign')
+def bench_sign():
+    key = PrivateKey(BENCH_SECRET)
+    return lambda: key.sign(BENCH_Z)
+
+@benchmark('verify')
+def bench_verify():
+    key = PrivateKey(BENCH_SECRET)
+    sig = key.sign(BENCH_Z)
+    return lambda: key.point.verify_uncached(BENCH_Z, sig)
+
+@benchmark('sec')
+def bench_sec():
+    point = PrivateKey(BENCH_SECRET).point
+    return lambda: point.sec()
+
+@benchmark('parse_sec')
+def bench_parse_sec():
+    sec = PrivateKey(BENCH_SECRET).point.sec()
+    return lambda: parse_sec(sec)
+
+@benchmark('der')
+def bench_der():
+    sig = PrivateKey(BENCH_SECRET).sign(BENCH_Z)
+    return lambda: sig.der()
+
+@benchmark('encode_base58')
+def bench_encode_base58():
+    data = b'\x00' + BENCH_Z.to_bytes(32, 'big')[:24]
+    return lambda: encode_base58(data)
+
+@benchmark('address')
+def bench_address():
+    point = PrivateKey(BENCH_SECRET).point
+    return lambda: point.address()
+
+@benchmark('wif')
+def bench_wif():
+    key = PrivateKey(BENCH_SECRET)
+    return lambda: key.wif()
+
+@benchmark('read_varint')
+def bench_read_varint():
+    data = encode_varint(0x12345)
+    return lambda: read_varint(BytesIO(data))
+
+@benchmark('encode_varint')
+def bench_encode_varint():
+    return lambda: encode_varint(0x12345)
+
+@benchmark('tx_parse')
+def bench_tx_parse():
+    return lambda: Tx.parse(BytesIO(BENCH_TX))
+
+def run_benchmark(setup, repeat=5):
+    op = setup()
+    timer = Timer(op)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    tracemalloc.start()
+    op()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    op()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    calls = 1000
+    blocks = sys.getallocatedblocks()
+    for _ in range(calls):
+        op()
+    retained = (sys.getallocatedblocks() - blocks) / calls
+    return {
+        'ops_per_s': number / best,
+        'us_per_op': best / number * 1e6,
+        'peak_bytes': peak,
+        'retained_blocks': retained,
+    }
+
+def run_benchmarks(names=None, repeat=5):
+    '''esegue i benchmark indicati (tutti se names è None) e restituisce i risultati pronti per json'''
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = run_benchmark(BENCHMARKS[name], repeat)
+    return {
+        'python': platform.python_implementation() + ' ' + platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(current, baseline, tolerance=0.1):
+    #restituisce le operazioni più lente della baseline di oltre tolerance (0.1 = 10%), come (nome, ops/s prima, ops/s ora, variazione)
+    regressions = []
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        change = result['ops_per_s'] / old['ops_per_s'] - 1
+        if change < -tolerance:
+            regressions.append((name, old['ops_per_s'], result['ops_per_s'], change))
+    return regressions
+
+def format_results(results, baseline=None):
+    lines = ['{:<16} {:>14} {:>12} {:>12} {:>10}'.format('benchmark', 'ops/s', 'us/op', 'peak bytes', 'vs base')]
+    for name, result in results['results'].items():
+        change = ''
+        if baseline is not None and name in baseline['results']:
+            change = '{:+.1%}'.format(result['ops_per_s'] / baseline['results'][name]['ops_per_s'] - 1)
+        lines.append('{:<16} {:>14,.0f} {:>12.2f} {:>12} {:>10}'.format(
+            name, result['ops_per_s'], result['us_per_op'], result['peak_bytes'], change))
+    return '\n'.join(lines)
+
+"""
+Per esempio, prima e dopo una modifica:
+
+>>> save_results(run_benchmarks(), 'baseline.json')
+
+(modifica al codice)
+
+>>> results = run_benchmarks()
+>>> print(format_results(results, load_results('baseline.json')))
+benchmark                 ops/s        us/op   peak bytes    vs base
+field_add             2,327,089         0.43          128      +0.4%
+...
+>>> compare_results(results, load_results('baseline.json'))
+[]
+
+Una lista non vuota vuol dire che qualcosa è peggiorato di oltre il 10%: prima di mettere in produzione va capito perché. I numeri
+assoluti cambiano da macchina a macchina, quindi la baseline va sempre misurata sulla stessa macchina.
+"""
@@ -0,0 +1,198 @@
+"""
+CONTARE LE OPERAZIONI
+
+Il benchmark ci dice quanto costa una verify, ma non dove va il tempo: quante somme e quanti raddoppi di punti, quante inversioni, quante
+operazioni sugli elementi del campo. Per saperlo dobbiamo contarle.
+
+Il modo più semplice sarebbe aggiungere un contatore dentro ogni metodo, ma così pagheremmo il contatore sempre, anche quando non ci
+interessa, e in produzione vogliamo codice veloce. In Python però metodi e funzioni si possono sostituire mentre il programma gira:
+quando la strumentazione viene attivata, sostituiamo ogni metodo o funzione da contare con un "wrapper" che incrementa il contatore e poi
+chiama l'originale; quando viene disattivata, rimettiamo gli originali al loro posto. Da disattivata costa quindi esattamente zero: il
+codice che gira è quello di prima, e possiamo lasciarla sempre disponibile per diagnosticare un problema direttamente in produzione.
+
+Contiamo:
+- le operazioni di FieldElement e delle sue sottoclassi (somma, sottrazione, moltiplicazione, potenza, divisione);
+- le operazioni sui punti: Point.__add__ in coordinate affini, e i raddoppi e le somme in coordinate jacobiane (vedi
+  ../1. Crittografia/5. CoordinateJacobiane), che da lì in poi sono quelle usate da moltiplicazione, firma e verifica;
+- le inversioni: from_jacobian ne fa una, batch_inverse una per tutta la lista.
+Le moltiplicazioni modulo P dentro le formule jacobiane sono operazioni sugli interi e non si possono contare, ma ogni raddoppio e ogni
+somma ne fa sempre lo stesso numero. Per sign, verify e parse misuriamo anche quante volte sono state chiamate e il tempo totale.
+"""
+
+import functools
+import threading
+import time
+from collections import Counter
+
+COUNTED_METHODS = [      #(classe, metodo, contatore): vengono strumentate anche le sottoclassi che ridefiniscono il metodo
+    (FieldElement, '__add__', 'field_add'),
+    (FieldElement, '__sub__', 'field_sub'),
+    (FieldElement, '__mul__', 'field_mul'),
+    (FieldElement, '__rmul__', 'field_mul'),
+    (FieldElement, '__pow__', 'field_pow'),
+    (FieldElement, '__truediv__', 'field_div'),
+    (Point, '__add__', 'point_add_affine'),
+]
+
+COUNTED_FUNCTIONS = [
+    ('jacobian_double', 'point_double'),
+    ('jacobian_add', 'point_add'),
+    ('jacobian_add_affine', 'point_add_mixed'),
+    ('from_jacobian', 'inversion'),
+    ('batch_inverse', 'batch_inversion'),
+]
+
+TIMED_METHODS = [
+    (PrivateKey, 'sign', 'sign'),
+    (S256Point, 'verify', 'verify'),
+    (S256Point, 'parse', 'parse_sec'),
+    (Signature, 'parse', 'parse_der'),
+    (Tx, 'parse', 'parse_tx'),
+]
+
+def subclasses(cls):
+    result = [cls]
+    for sub in cls.__subclasses__():
+        result.extend(subclasses(sub))
+    return result
+
+def wrap_attribute(value, wrapper):
+    #classmethod e staticmethod vanno "aperti" e richiusi
+    if isinstance(value, (classmethod, staticmethod)):
+        return type(value)(wrapper(value.__func__))
+    return wrapper(value)
+
+class Instrumentation:
+
+    def __init__(self):
+        self.originals = []     #(dove, nome, valore originale) per ogni sostituzione fatta
+        self.counters = Counter()
+        self.timings = {}       #nome: [chiamate, secondi]
+        self.local = threading.local()      #per ogni thread, le categorie con una chiamata contata in corso
+
+    def __repr__(self):
+        return 'Instrumentation(enabled={}, operations={})'.format(self.enabled, sum(self.counters.values()))
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    @property
+    def enabled(self):
+        return bool(self.originals)
+
+    def reset(self):
+        #svuotiamo i contatori senza sostituirli: i wrapper già installati continuano a usarli
+        self.counters.clear()
+        self.timings.clear()
+
+    def counting(self, category):
+        #i metodi di S256Field ricadono su quelli di FieldElement, e sono strumentati tutti e due: una chiamata dentro un'altra della
+        #stessa categoria non va contata di nuovo
+        counters = self.counters
+        local = self.local
+        def wrapper(func):
+            @functools.wraps(func)
+            def counted(*args, **kwargs):
+                active = local.__dict__.setdefault('active', set())
+                if category in active:
+                    return func(*args, **kwargs)
+                counters[category] += 1
+                active.add(category)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    active.discard(category)
+            return counted
+        return wrapper
+
+    def timing(self, metric):
+        timings = self.timings
+        def wrapper(func):
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    timing = timings.setdefault(metric, [0, 0.0])
+                    timing[0] += 1
+                    timing[1] += time.perf_counter() - start
+            return timed
+        return wrapper
+
+    def replace(self, owner, name, wrapper):
+        if isinstance(owner, dict):
+            original = owner[name]
+            owner[name] = wrap_attribute(original, wrapper)
+        else:
+            original = owner.__dict__[name]
+            setattr(owner, name, wrap_attribute(original, wrapper))
+        self.originals.append((owner, name, original))
+
+    def enable(self):
+        if self.enabled:
+            return
+        for base, name, category in COUNTED_METHODS:
+            for cls in subclasses(base):
+                if name in cls.__dict__:
+                    self.replace(cls, name, self.counting(category))
+        namespace = globals()
+        for name, category in COUNTED_FUNCTIONS:
+            if name in namespace:
+                self.replace(namespace, name, self.counting(category))
+        for cls, name, metric in TIMED_METHODS:
+            if name in cls.__dict__:
+                self.replace(cls, name, self.timing(metric))
+
+    def disable(self):
+        while self.originals:
+            owner, name, original = self.originals.pop()
+            if isinstance(owner, dict):
+                owner[name] = original
+            else:
+                setattr(owner, name, original)
+
+    def snapshot(self):
+        return {
+            'operations': dict(self.counters),
+            'timings': {metric: {'count': count, 'seconds': seconds} for metric, (count, seconds) in self.timings.items()},
+        }
+
+    def prometheus(self, prefix='bitcoin'):
+        #i contatori nel formato testuale di Prometheus
+        lines = [
+            '# HELP {}_operations_total Curve and field operations.'.format(prefix),
+            '# TYPE {}_operations_total counter'.format(prefix),
+        ]
+        for category, count in sorted(self.counters.items()):
+            lines.append('{}_operations_total{{op="{}"}} {}'.format(prefix, category, count))
+        lines.append('# HELP {}_call_seconds Time spent in sign, verify and parse calls.'.format(prefix))
+        lines.append('# TYPE {}_call_seconds summary'.format(prefix))
+        for metric, (count, seconds) in sorted(self.timings.items()):
+            lines.append('{}_call_seconds_count{{call="{}"}} {}'.format(prefix, metric, count))
+            lines.append('{}_call_seconds_sum{{call="{}"}} {:.6f}'.format(prefix, metric, seconds))
+        return '\n'.join(lines) + '\n'
+
+INSTRUMENTATION = Instrumentation()
+
+"""
+>>> key = PrivateKey(12345)
+>>> sig = key.sign(1000)
+>>> with INSTRUMENTATION:
+...     key.point.verify_uncached(1000, sig)
+True
+>>> INSTRUMENTATION.snapshot()
+{'operations': {'point_double': 258, 'point_add': 50, 'point_add_mixed': 31, 'inversion': 1}, 'timings': {}}
+>>> print(INSTRUMENTATION.prometheus())
+# HELP bitcoin_operations_total Curve and field operations.
+# TYPE bitcoin_operations_total counter
+bitcoin_operations_total{op="inversion"} 1
+...
+
+Una verify fa quindi circa 255 raddoppi, un'ottantina di somme e una sola inversione: il tempo va quasi tutto nei raddoppi.
+Con la strumentazione attiva una verify diventa più lenta di circa il 2%; disattivata, non cambia nulla.
+"""